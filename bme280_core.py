@@ -0,0 +1,520 @@
+# Updated 2018
+# This module is based on the below cited resources, which are all
+# based on the documentation as provided in the Bosch Data Sheet and
+# the sample implementation provided therein.
+#
+# Final Document: BST-BME280-DS002-15
+#
+# Authors: Paul Cunnane 2016, Peter Dahlebrg 2016
+#
+# This module borrows from the Adafruit BME280 Python library. Original
+# Copyright notices are reproduced below.
+#
+# Those libraries were written for the Raspberry Pi. This modification is
+# intended for the MicroPython and esp8266 boards.
+#
+# Copyright (c) 2014 Adafruit Industries
+# Author: Tony DiCola
+#
+# Based on the BMP280 driver with BME280 changes provided by
+# David J Taylor, Edinburgh (www.satsignal.eu)
+#
+# Based on Adafruit_I2C.py created by Kevin Townsend.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Based on the documentation as provided in the Bosch Data Sheet and
+# the sample implementation provided therein.
+# Document BST-BME280-DS002-15
+#
+
+import time
+from math import log, pow
+try:
+    from ustruct import unpack
+except ImportError:
+    from struct import unpack
+from array import array
+import bme280_metrics
+
+_NAN = float("nan")
+
+# BME280 default address.
+BME280_I2CADDR = 0x76
+
+# Operating Modes
+BME280_OSAMPLE_1 = 1
+BME280_OSAMPLE_2 = 2
+BME280_OSAMPLE_4 = 3
+BME280_OSAMPLE_8 = 4
+BME280_OSAMPLE_16 = 5
+# Only for the per channel osrs_t, osrs_p, osrs_h settings
+BME280_OSAMPLE_SKIP = 0
+
+# IIR filter coefficients
+BME280_FILTER_OFF = 0
+BME280_FILTER_2 = 1
+BME280_FILTER_4 = 2
+BME280_FILTER_8 = 3
+BME280_FILTER_16 = 4
+
+# Standby times between normal mode measurements
+BME280_STANDBY_0_5 = 0
+BME280_STANDBY_62_5 = 1
+BME280_STANDBY_125 = 2
+BME280_STANDBY_250 = 3
+BME280_STANDBY_500 = 4
+BME280_STANDBY_1000 = 5
+BME280_STANDBY_10 = 6
+BME280_STANDBY_20 = 7
+# standby times in us, indexed by BME280_STANDBY_*
+_STANDBY_US = (500, 62500, 125000, 250000, 500000, 1000000, 10000, 20000)
+
+BME280_REGISTER_CHIPID = 0xD0
+BME280_REGISTER_CONTROL_HUM = 0xF2
+BME280_REGISTER_STATUS = 0xF3
+BME280_REGISTER_CONTROL = 0xF4
+BME280_REGISTER_CONFIG = 0xF5
+
+
+def max_measurement_time(osrs_t, osrs_p, osrs_h):
+    """ Returns the maximum forced mode measurement time in us for the given
+        oversampling settings, according to datasheet section 9.1.
+
+        Args:
+            osrs_t, osrs_p, osrs_h: BME280_OSAMPLE_* value of the channel
+    """
+    t = 1250
+    if osrs_t:
+        t += 2300 << (osrs_t - 1)
+    if osrs_p:
+        t += (2300 << (osrs_p - 1)) + 575
+    if osrs_h:
+        t += (2300 << (osrs_h - 1)) + 575
+    return t
+
+
+def typical_measurement_time(osrs_t, osrs_p, osrs_h):
+    """ Returns the typical measurement time in us for the given
+        oversampling settings, according to datasheet section 9.1. In
+        normal mode, the sensor repeats measurements every typical
+        measurement time plus the standby time.
+
+        Args:
+            osrs_t, osrs_p, osrs_h: BME280_OSAMPLE_* value of the channel
+    """
+    t = 1000
+    if osrs_t:
+        t += 2000 << (osrs_t - 1)
+    if osrs_p:
+        t += (2000 << (osrs_p - 1)) + 500
+    if osrs_h:
+        t += (2000 << (osrs_h - 1)) + 500
+    return t
+
+
+class BME280:
+    """ Driver for the BME280 on an I2C bus.
+
+        Reading the sensor and its calibration is done here, turning the raw
+        values into temperature, pressure and humidity is left to a
+        compensation engine, which is picked with the engine argument or the
+        engine class attribute of a subclass. The engines are:
+
+            bme280_int.IntCompensation: 64 bit integer math, the default
+            bme280_int32.Int32Compensation: 32 bit integer math
+            bme280_float.FloatCompensation: floating point math
+    """
+
+    # compensation engine class used if none is passed to the constructor
+    engine = None
+
+    def __init__(self,
+                 mode=BME280_OSAMPLE_8,
+                 address=BME280_I2CADDR,
+                 i2c=None,
+                 calibration=None,
+                 osrs_t=None,
+                 osrs_p=None,
+                 osrs_h=None,
+                 iir=BME280_FILTER_OFF,
+                 standby=BME280_STANDBY_0_5,
+                 engine=None,
+                 **kwargs):
+        # Check that mode is valid.
+        if mode not in [BME280_OSAMPLE_1, BME280_OSAMPLE_2, BME280_OSAMPLE_4,
+                        BME280_OSAMPLE_8, BME280_OSAMPLE_16]:
+            raise ValueError(
+                'Unexpected mode value {0}. Set mode to one of '
+                'BME280_ULTRALOWPOWER, BME280_STANDARD, BME280_HIGHRES, or '
+                'BME280_ULTRAHIGHRES'.format(mode))
+        self._mode = mode
+        # per channel oversampling, defaulting to mode
+        osrs_t = mode if osrs_t is None else osrs_t
+        osrs_p = mode if osrs_p is None else osrs_p
+        osrs_h = mode if osrs_h is None else osrs_h
+        for osrs in (osrs_t, osrs_p, osrs_h):
+            if not BME280_OSAMPLE_SKIP <= osrs <= BME280_OSAMPLE_16:
+                raise ValueError(
+                    'Unexpected oversampling value {0}'.format(osrs))
+        if osrs_t == BME280_OSAMPLE_SKIP:
+            # pressure and humidity compensation depend on the temperature
+            raise ValueError('Temperature measurement cannot be skipped')
+        if not BME280_FILTER_OFF <= iir <= BME280_FILTER_16:
+            raise ValueError('Unexpected iir value {0}'.format(iir))
+        if not BME280_STANDBY_0_5 <= standby <= BME280_STANDBY_20:
+            raise ValueError('Unexpected standby value {0}'.format(standby))
+        self._osrs_p = osrs_p
+        self._osrs_h = osrs_h
+        # ctrl_meas without the mode bits, which start out as sleep mode
+        self._ctrl_meas = osrs_t << 5 | osrs_p << 2
+        self._config = standby << 5 | iir << 2
+        self.address = address
+        if i2c is None:
+            raise ValueError('An I2C object is required.')
+        self.i2c = i2c
+        self.__sealevel = 101325
+
+        # load calibration data, unless a copy of it for the same chip id
+        # was passed in (see the calibration attribute)
+        chip_id = self.i2c.readfrom_mem(self.address,
+                                        BME280_REGISTER_CHIPID, 1)
+        if (calibration is not None and len(calibration) == 34 and
+                calibration[0] == chip_id[0]):
+            dig_88_a1 = calibration[1:27]
+            dig_e1_e7 = calibration[27:34]
+        else:
+            dig_88_a1 = self.i2c.readfrom_mem(self.address, 0x88, 26)
+            dig_e1_e7 = self.i2c.readfrom_mem(self.address, 0xE1, 7)
+        # chip id followed by the raw trim registers, may be persisted and
+        # passed back in as the calibration argument to skip the bus reads
+        self.calibration = chip_id + dig_88_a1 + dig_e1_e7
+        self.dig_T1, self.dig_T2, self.dig_T3, self.dig_P1, \
+            self.dig_P2, self.dig_P3, self.dig_P4, self.dig_P5, \
+            self.dig_P6, self.dig_P7, self.dig_P8, self.dig_P9, \
+            _, self.dig_H1 = unpack("<HhhHhhhhhhhhBB", dig_88_a1)
+
+        self.dig_H2, self.dig_H3, self.dig_H4,\
+            self.dig_H5, self.dig_H6 = unpack("<hBbhb", dig_e1_e7)
+        # unfold H4, H5, keeping care of a potential sign
+        self.dig_H4 = (self.dig_H4 * 16) + (self.dig_H5 & 0xF)
+        self.dig_H5 //= 16
+
+        engine = engine or self.engine
+        if engine is None:
+            raise ValueError('A compensation engine is required.')
+        self._engine = engine(self)
+        self._compensate = self._engine.compensate
+
+        # ctrl_hum takes effect with the next ctrl_meas write, config is
+        # only written reliably in sleep mode
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
+                             bytearray([osrs_h]))
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
+                             bytearray([self._ctrl_meas]))
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONFIG,
+                             bytearray([self._config]))
+
+        self._meas_us = max_measurement_time(osrs_t, osrs_p, osrs_h)
+        self._typ_us = typical_measurement_time(osrs_t, osrs_p, osrs_h)
+        # ticks_us when the running forced mode conversion ends, or None
+        self._meas_end = None
+
+        # temporary data holders which stay allocated
+        self._l1_barray = bytearray(1)
+        self._l8_barray = bytearray(8)
+        self._l3_resultarray = array("i", [0, 0, 0])
+        # compensated sample for the altitude, dew_point, values properties
+        self._sample = array(self._engine.typecode, (0, 0, 0))
+
+    def start_measurement(self):
+        """ Triggers a forced mode measurement without waiting for it. The
+            next read_raw_data call reads its result, so other work can be
+            done while the sensor converts.
+
+            Returns:
+                the predicted conversion time in us
+        """
+        self._l1_barray[0] = self._osrs_h
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
+                             self._l1_barray)
+        self._trigger()
+        return self._meas_us
+
+    def _trigger(self):
+        self._l1_barray[0] = self._ctrl_meas | 1
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
+                             self._l1_barray)
+        self._meas_end = time.ticks_add(time.ticks_us(), self._meas_us)
+
+    def _wait_measurement(self):
+        """ Sleeps until the predicted end of the running conversion, then
+            polls the status register in 1ms steps in case it is late.
+        """
+        wait = time.ticks_diff(self._meas_end, time.ticks_us())
+        if wait > 0:
+            time.sleep_us(wait)
+        self._meas_end = None
+        while self._measuring():
+            time.sleep_ms(1)
+
+    def _measuring(self):
+        # the measuring bit of the status register
+        self.i2c.readfrom_mem_into(self.address, BME280_REGISTER_STATUS,
+                                   self._l1_barray)
+        return self._l1_barray[0] & 0x08
+
+    def read_raw_data(self, result):
+        """ Reads the raw (uncompensated) data from the sensor. Triggers a
+            measurement, unless start_measurement was called before.
+
+            Args:
+                result: array of length 3 or alike where the result will be
+                stored, in temperature, pressure, humidity order
+            Returns:
+                None
+        """
+        if self._meas_end is None:
+            self.start_measurement()
+        self._wait_measurement()
+        self._read_burst(result)
+
+    def _read_burst(self, result):
+        # burst readout from 0xF7 to 0xFE, recommended by datasheet
+        self.i2c.readfrom_mem_into(self.address, 0xF7, self._l8_barray)
+        readout = self._l8_barray
+        # pressure(0xF7): ((msb << 16) | (lsb << 8) | xlsb) >> 4
+        raw_press = ((readout[0] << 16) | (readout[1] << 8) | readout[2]) >> 4
+        # temperature(0xFA): ((msb << 16) | (lsb << 8) | xlsb) >> 4
+        raw_temp = ((readout[3] << 16) | (readout[4] << 8) | readout[5]) >> 4
+        # humidity(0xFD): (msb << 8) | lsb
+        raw_hum = (readout[6] << 8) | readout[7]
+
+        result[0] = raw_temp
+        result[1] = raw_press
+        result[2] = raw_hum
+
+    def read_compensated_data(self, result=None):
+        """ Reads the data from the sensor and returns the compensated data.
+
+            Args:
+                result: array of length 3 or alike where the result will be
+                stored, in temperature, pressure, humidity order. You may use
+                this to read out the sensor without allocating heap memory
+
+            Returns:
+                array with temperature, pressure, humidity. Will be the one
+                from the result parameter if not None, otherwise a new one
+        """
+        self.read_raw_data(self._l3_resultarray)
+        if result is None:
+            result = array(self._engine.typecode, (0, 0, 0))
+        self._compensate(self._l3_resultarray, result, 0)
+        return result
+
+    def read_batch(self, n, out):
+        """ Takes n forced mode samples in a row and stores the compensated
+            data in out. The humidity control register is written only once
+            and each conversion is waited for using the computed measurement
+            time instead of polling the status register.
+
+            Args:
+                n: number of samples to take
+                out: array with at least n * 3 entries, it will be filled
+                with temperature, pressure, humidity triples
+
+            Returns:
+                out
+        """
+        if len(out) < n * 3:
+            raise ValueError('out needs room for {} values'.format(n * 3))
+        self.start_measurement()
+        raw = self._l3_resultarray
+        for i in range(0, n * 3, 3):
+            if i:
+                self._trigger()
+            self._wait_measurement()
+            self._read_burst(raw)
+            self._compensate(raw, out, i)
+        return out
+
+    def stream(self, result=None, standby=None):
+        """ Runs the sensor in normal mode and yields compensated samples at
+            its own cadence, every typical measurement time plus standby
+            time. Each sample is read out when the measuring bit of the
+            status register falls, as the clock of the sensor drifts
+            against ours, without triggering a measurement. When the
+            consumer falls behind, the latest sample is read right away.
+            The sensor goes back to sleep mode when the generator is
+            closed.
+
+            Args:
+                result: array of length 3 or alike where the samples will be
+                stored, in temperature, pressure, humidity order. The same
+                array is yielded for every sample
+                standby: BME280_STANDBY_* value, by default the one passed to
+                the constructor
+
+            Yields:
+                result
+        """
+        if standby is not None:
+            if not BME280_STANDBY_0_5 <= standby <= BME280_STANDBY_20:
+                raise ValueError(
+                    'Unexpected standby value {0}'.format(standby))
+            self._config = standby << 5 | (self._config & 0x1F)
+        if result is None:
+            result = array(self._engine.typecode, (0, 0, 0))
+        period = self._typ_us + _STANDBY_US[self._config >> 5]
+        # how early to start watching for the end of a conversion
+        margin = period >> 3
+        raw = self._l3_resultarray
+        buf = self._l1_barray
+
+        # config is only written reliably in sleep mode
+        buf[0] = self._ctrl_meas
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL, buf)
+        buf[0] = self._config
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONFIG, buf)
+        buf[0] = self._osrs_h
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM, buf)
+        buf[0] = self._ctrl_meas | 3
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL, buf)
+        self._meas_end = None
+        try:
+            # predicted end of the next conversion, the first one starts
+            # right away
+            end = time.ticks_add(time.ticks_us(), self._typ_us)
+            while True:
+                wait = time.ticks_diff(end, time.ticks_us()) - margin
+                if wait > 0:
+                    time.sleep_us(wait)
+                if time.ticks_diff(time.ticks_us(), end) < margin:
+                    # wait for the conversion to start, then to end
+                    deadline = time.ticks_add(end, margin)
+                    seen = False
+                    while time.ticks_diff(deadline, time.ticks_us()) > 0:
+                        if self._measuring():
+                            seen = True
+                            break
+                        time.sleep_us(100)
+                    if seen:
+                        while self._measuring():
+                            time.sleep_us(100)
+                        end = time.ticks_us()
+                end = time.ticks_add(end, period)
+                while time.ticks_diff(end, time.ticks_us()) <= 0:
+                    # the consumer took longer than a period
+                    end = time.ticks_add(end, period)
+                self._read_burst(raw)
+                self._compensate(raw, result, 0)
+                yield result
+        finally:
+            buf[0] = self._ctrl_meas
+            self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL, buf)
+
+    @property
+    def measurement_time(self):
+        """ Predicted forced mode conversion time in us. """
+        return self._meas_us
+
+    @property
+    def t_fine(self):
+        """ Fine temperature of the last compensated sample. """
+        return self._engine.t_fine
+
+    @property
+    def sealevel(self):
+        return self.__sealevel
+
+    @sealevel.setter
+    def sealevel(self, value):
+        if 30000 < value < 120000:  # just ensure some reasonable value, Pa
+            self.__sealevel = value
+
+    def altitude_from(self, sample):
+        """ Altitude in m for the pressure of an already read sample, 0.0
+            if the pressure was skipped.
+        """
+        p = sample[1] / self._engine.scale[1]
+        if p <= 0:
+            return 0.0
+        return 44330 * (1.0 - pow(p / self.__sealevel, 0.1903))
+
+    def dew_point_from(self, sample):
+        """ Dew point for the temperature and humidity of an already read
+            sample, in the temperature unit of the engine, NaN if the
+            humidity was skipped.
+        """
+        t_scale, _, h_scale = self._engine.scale
+        t = sample[0] / t_scale
+        h = sample[2] / h_scale
+        if h <= 0:
+            return _NAN
+        h = (log(h, 10) - 2) / 0.4343 + (17.62 * t) / (243.12 + t)
+        return (243.12 * h / (17.62 - h)) * t_scale
+
+    def metrics_from(self, sample, out=None, elevation=0, fast=False):
+        """ Computes altitude, dew point, absolute humidity, heat index and
+            sea level pressure of an already read sample in one pass, see
+            bme280_metrics.metrics.
+
+            Args:
+                sample: compensated sample as read by read_compensated_data
+                out: array("f") or alike of length 5 for the results,
+                allocated if None
+                elevation: elevation of the sensor in m
+                fast: use the log/exp approximations
+
+            Returns:
+                out, indexed by the bme280_metrics constants
+        """
+        if out is None:
+            out = array("f", (0, 0, 0, 0, 0))
+        t_scale, p_scale, h_scale = self._engine.scale
+        return bme280_metrics.metrics(
+            sample[0] / t_scale, sample[1] / p_scale, sample[2] / h_scale,
+            out, self.__sealevel, elevation, fast)
+
+    def values_from(self, sample):
+        """ human readable values of an already read sample """
+        t_scale, p_scale, h_scale = self._engine.scale
+        return ("{:.2f}C".format(sample[0] / t_scale),
+                "{:.2f}hPa".format(sample[1] / p_scale / 100),
+                "{:.2f}%".format(sample[2] / h_scale))
+
+    @property
+    def altitude(self):
+        '''
+        Altitude in m.
+        '''
+        return self.altitude_from(self.read_compensated_data(self._sample))
+
+    @property
+    def dew_point(self):
+        """
+        Compute the dew point temperature for the current Temperature
+        and Humidity measured pair, in the temperature unit of the engine
+        """
+        return self.dew_point_from(self.read_compensated_data(self._sample))
+
+    @property
+    def values(self):
+        """ human readable values """
+        return self.values_from(self.read_compensated_data(self._sample))
@@ -44,204 +44,93 @@
 # Document BST-BME280-DS002-15
 #
 
-import time
-from ustruct import unpack, unpack_from
-from array import array
-
-# BME280 default address.
-BME280_I2CADDR = 0x76
-
-# Operating Modes
-BME280_OSAMPLE_1 = 1
-BME280_OSAMPLE_2 = 2
-BME280_OSAMPLE_4 = 3
-BME280_OSAMPLE_8 = 4
-BME280_OSAMPLE_16 = 5
-
-BME280_REGISTER_CONTROL_HUM = 0xF2
-BME280_REGISTER_STATUS = 0xF3
-BME280_REGISTER_CONTROL = 0xF4
-
-
-class BME280:
-
-    def __init__(self,
-                 mode=BME280_OSAMPLE_8,
-                 address=BME280_I2CADDR,
-                 i2c=None,
-                 **kwargs):
-        # Check that mode is valid.
-        if mode not in [BME280_OSAMPLE_1, BME280_OSAMPLE_2, BME280_OSAMPLE_4,
-                        BME280_OSAMPLE_8, BME280_OSAMPLE_16]:
-            raise ValueError(
-                'Unexpected mode value {0}. Set mode to one of '
-                'BME280_ULTRALOWPOWER, BME280_STANDARD, BME280_HIGHRES, or '
-                'BME280_ULTRAHIGHRES'.format(mode))
-        self._mode = mode
-        self.address = address
-        if i2c is None:
-            raise ValueError('An I2C object is required.')
-        self.i2c = i2c
-        self.__sealevel = 101325
-
-        # load calibration data
-        dig_88_a1 = self.i2c.readfrom_mem(self.address, 0x88, 26)
-        dig_e1_e7 = self.i2c.readfrom_mem(self.address, 0xE1, 7)
-        self.dig_T1, self.dig_T2, self.dig_T3, self.dig_P1, \
-            self.dig_P2, self.dig_P3, self.dig_P4, self.dig_P5, \
-            self.dig_P6, self.dig_P7, self.dig_P8, self.dig_P9, \
-            _, self.dig_H1 = unpack("<HhhHhhhhhhhhBB", dig_88_a1)
-
-        self.dig_H2, self.dig_H3, self.dig_H4,\
-            self.dig_H5, self.dig_H6 = unpack("<hBbhb", dig_e1_e7)
-        # unfold H4, H5, keeping care of a potential sign
-        self.dig_H4 = (self.dig_H4 * 16) + (self.dig_H5 & 0xF)
-        self.dig_H5 //= 16
-
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
-                             bytearray([0x3F]))
+import bme280_core
+# constants, re-exported for compatibility
+from bme280_core import *
+
+
+class IntCompensation:
+    """ Compensation using the 64 bit integer formulas of the datasheet.
+
+        Temperature is in 0.01 degC, pressure in Q24.8 Pa (1/256 Pa) and
+        humidity in Q22.10 %RH (1/1024 %RH).
+    """
+
+    typecode = "i"
+    # divisors to get degC, Pa and %RH
+    scale = (100, 256, 1024)
+
+    def __init__(self, sensor):
+        # Fold the loop invariant parts of the formulas into a coefficient
+        # table, so that compensate only has to unpack it into locals. A
+        # tuple is used as it unpacks without allocating an iterator.
+        s = sensor
+        self._coef = (
+            s.dig_T1 * 2, s.dig_T2, s.dig_T1, s.dig_T3,
+            s.dig_P6, s.dig_P5, s.dig_P3, s.dig_P2, s.dig_P1,
+            s.dig_P9, s.dig_P8, s.dig_P7 << 4,
+            16384 - (s.dig_H4 << 20), s.dig_H5, s.dig_H6,
+            s.dig_H3, s.dig_H2, s.dig_H1)
+        # these do not fit into 32 bits
+        self._p4_35 = s.dig_P4 << 35
+        self._p1_47 = s.dig_P1 << 47
+        self._osrs_p = s._osrs_p
+        self._osrs_h = s._osrs_h
         self.t_fine = 0
 
-        # temporary data holders which stay allocated
-        self._l1_barray = bytearray(1)
-        self._l8_barray = bytearray(8)
-        self._l3_resultarray = array("i", [0, 0, 0])
-
-    def read_raw_data(self, result):
-        """ Reads the raw (uncompensated) data from the sensor.
-
-            Args:
-                result: array of length 3 or alike where the result will be
-                stored, in temperature, pressure, humidity order
-            Returns:
-                None
-        """
-
-        self._l1_barray[0] = self._mode
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
-                             self._l1_barray)
-        self._l1_barray[0] = self._mode << 5 | self._mode << 2 | 1
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
-                             self._l1_barray)
-
-        # Wait for conversion to complete
-        while self.i2c.readfrom_mem(self.address, BME280_REGISTER_STATUS, 1)[0] & 0x08:
-            time.sleep_ms(10)
-
-        # burst readout from 0xF7 to 0xFE, recommended by datasheet
-        self.i2c.readfrom_mem_into(self.address, 0xF7, self._l8_barray)
-        readout = self._l8_barray
-        # pressure(0xF7): ((msb << 16) | (lsb << 8) | xlsb) >> 4
-        raw_press = ((readout[0] << 16) | (readout[1] << 8) | readout[2]) >> 4
-        # temperature(0xFA): ((msb << 16) | (lsb << 8) | xlsb) >> 4
-        raw_temp = ((readout[3] << 16) | (readout[4] << 8) | readout[5]) >> 4
-        # humidity(0xFD): (msb << 8) | lsb
-        raw_hum = (readout[6] << 8) | readout[7]
-
-        result[0] = raw_temp
-        result[1] = raw_press
-        result[2] = raw_hum
-
-    def read_compensated_data(self, result=None):
-        """ Reads the data from the sensor and returns the compensated data.
-
-            Args:
-                result: array of length 3 or alike where the result will be
-                stored, in temperature, pressure, humidity order. You may use
-                this to read out the sensor without allocating heap memory
-
-            Returns:
-                array with temperature, pressure, humidity. Will be the one
-                from the result parameter if not None
+    def compensate(self, raw, result, i):
+        """ Compensates the raw temperature, pressure, humidity triple and
+            stores it in result, starting at index i.
         """
-        self.read_raw_data(self._l3_resultarray)
-        raw_temp, raw_press, raw_hum = self._l3_resultarray
+        # indexing, as unpacking an array allocates an iterator
+        raw_temp = raw[0]
+        raw_press = raw[1]
+        raw_hum = raw[2]
+        T1x2, T2, T1, T3, P6, P5, P3, P2, P1, P9, P8, P7x16, \
+            H_off, H5, H6, H3, H2, H1 = self._coef
         # temperature
-        var1 = (((raw_temp // 8) - (self.dig_T1 * 2)) * self.dig_T2) // 2048
-        var2 = (raw_temp // 16) - self.dig_T1
-        var2 = (((var2 * var2) // 4096) * self.dig_T3) // 16384
-        self.t_fine = var1 + var2
-        temp = (self.t_fine * 5 + 128) // 256
+        var1 = (((raw_temp // 8) - T1x2) * T2) // 2048
+        var2 = (raw_temp // 16) - T1
+        var2 = (((var2 * var2) // 4096) * T3) // 16384
+        t_fine = var1 + var2
+        self.t_fine = t_fine
+        temp = (t_fine * 5 + 128) // 256
 
         # pressure
-        var1 = self.t_fine - 128000
-        var2 = var1 * var1 * self.dig_P6
-        var2 = var2 + ((var1 * self.dig_P5) << 17)
-        var2 = var2 + (self.dig_P4 << 35)
-        var1 = (((var1 * var1 * self.dig_P3) >> 8) +
-                ((var1 * self.dig_P2) << 12))
-        var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
-        if var1 == 0:
+        if not self._osrs_p:
             pressure = 0
         else:
-            p = ((((1048576 - raw_press) << 31) - var2) * 3125) // var1
-            var1 = (self.dig_P9 * (p >> 13) * (p >> 13)) >> 25
-            var2 = (self.dig_P8 * p) >> 19
-            pressure = ((p + var1 + var2) >> 8) + (self.dig_P7 << 4)
+            var1 = t_fine - 128000
+            var2 = var1 * var1 * P6
+            var2 = var2 + ((var1 * P5) << 17)
+            var2 = var2 + self._p4_35
+            var1 = (((var1 * var1 * P3) >> 8) + ((var1 * P2) << 12))
+            var1 = (self._p1_47 + var1 * P1) >> 33
+            if var1 == 0:
+                pressure = 0
+            else:
+                p = ((((1048576 - raw_press) << 31) - var2) * 3125) // var1
+                var1 = (P9 * (p >> 13) * (p >> 13)) >> 25
+                var2 = (P8 * p) >> 19
+                pressure = ((p + var1 + var2) >> 8) + P7x16
 
         # humidity
-        h = self.t_fine - 76800
-        h = (((((raw_hum << 14) - (self.dig_H4 << 20) -
-                (self.dig_H5 * h)) + 16384) >> 15) *
-             (((((((h * self.dig_H6) >> 10) *
-                (((h * self.dig_H3) >> 11) + 32768)) >> 10) + 2097152) *
-              self.dig_H2 + 8192) >> 14))
-        h = h - (((((h >> 15) * (h >> 15)) >> 7) * self.dig_H1) >> 4)
-        h = 0 if h < 0 else h
-        h = 419430400 if h > 419430400 else h
-        humidity = h >> 12
-
-        if result:
-            result[0] = temp
-            result[1] = pressure
-            result[2] = humidity
-            return result
-
-        return array("i", (temp, pressure, humidity))
-
-    @property
-    def sealevel(self):
-        return self.__sealevel
-
-    @sealevel.setter
-    def sealevel(self, value):
-        if 300 < value < 1200:  # just ensure some reasonable value
-            self.__sealevel = value
-
-    @property
-    def altitude(self):
-        '''
-        Altitude in m.
-        '''
-        from math import pow
-        try:
-            p = 44330 * (1.0 - pow((self.read_compensated_data()[1] / 256) /
-                                   self.__sealevel, 0.1903))
-        except:
-            p = 0.0
-        return p
-
-    @property
-    def dew_point(self):
-        """
-        Compute the dew point temperature for the current Temperature
-        and Humidity measured pair
-        """
-        from math import log
-        t, p, h = self.read_compensated_data()
-        t /= 100
-        h /= 1024
-        h = (log(h, 10) - 2) / 0.4343 + (17.62 * t) / (243.12 + t)
-        return (243.12 * h / (17.62 - h)) * 100
-
-    @property
-    def values(self):
-        """ human readable values """
-
-        t, p, h = self.read_compensated_data()
-
-        p = p / 256
-
-        h = h / 1024
-        return ("{}C".format(t / 100), "{:.02f}hPa".format(p/100),
-                "{:.02f}%".format(h))
+        if not self._osrs_h:
+            humidity = 0
+        else:
+            h = t_fine - 76800
+            h = (((((raw_hum << 14) + H_off) - (H5 * h)) >> 15) *
+                 (((((((h * H6) >> 10) * (((h * H3) >> 11) + 32768)) >> 10) +
+                    2097152) * H2 + 8192) >> 14))
+            h = h - (((((h >> 15) * (h >> 15)) >> 7) * H1) >> 4)
+            h = 0 if h < 0 else h
+            h = 419430400 if h > 419430400 else h
+            humidity = h >> 12
+
+        result[i] = temp
+        result[i + 1] = pressure
+        result[i + 2] = humidity
+
+
+class BME280(bme280_core.BME280):
+    engine = IntCompensation
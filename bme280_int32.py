@@ -0,0 +1,140 @@
+# BME280 compensation using only the 32 bit integer formulas of the Bosch
+# Data Sheet, Document BST-BME280-DS002-15, section 8.2. Pressure is less
+# precise than with the 64 bit formulas of bme280_int (1 Pa instead of
+# 1/256 Pa), but the intermediate values stay within the MicroPython
+# small int range, so that compensating a sample does not allocate.
+
+import bme280_core
+# constants, re-exported for compatibility
+from bme280_core import *
+
+
+class Int32Compensation:
+    """ Compensation using the 32 bit integer formulas of the datasheet.
+
+        Temperature is in 0.01 degC, pressure in Pa and humidity in Q22.10
+        %RH (1/1024 %RH).
+    """
+
+    typecode = "i"
+    # divisors to get degC, Pa and %RH
+    scale = (100, 1, 1024)
+
+    def __init__(self, sensor):
+        # loop invariant parts of the formulas, see IntCompensation. Some
+        # coefficients are split into high and low parts, so that products
+        # with them stay within the small int range.
+        s = sensor
+        self._coef = (
+            s.dig_T1 * 2, s.dig_T2 >> 5, s.dig_T2 & 31, s.dig_T1, s.dig_T3,
+            s.dig_P6, s.dig_P5, s.dig_P4 << 16, s.dig_P3, s.dig_P2,
+            s.dig_P1 >> 8, s.dig_P1 & 255, s.dig_P9, s.dig_P8, s.dig_P7,
+            s.dig_H4 << 6, s.dig_H5, s.dig_H6, s.dig_H3, s.dig_H2, s.dig_H1)
+        self._osrs_p = s._osrs_p
+        self._osrs_h = s._osrs_h
+        self.t_fine = 0
+
+    def compensate(self, raw, result, i):
+        """ Compensates the raw temperature, pressure, humidity triple and
+            stores it in result, starting at index i.
+
+            The datasheet formulas rely on 32 bit wrap-free intermediates,
+            while MicroPython small ints only hold 31 bits (30 bits and a
+            sign) and allocate a long int on the heap beyond. Products that
+            may exceed that are split up as x * (h * 2**k + l) with the
+            shifts regrouped, without ever building the large product. The
+            results are bit identical to the datasheet formulas evaluated
+            with unbounded ints, as in tests/reference/bme280_int32.py.
+            That leaves out the (p / var1) * 2 branch the datasheet takes
+            for p >= 0x80000000 to avoid an overflow, which gives 1 Pa less
+            on a fraction of a percent of the samples.
+            Within -40..85 degC and 300..1100 hPa and with the calibration
+            values found on real parts, a sample does not allocate.
+
+            Compared to the 64 bit formulas of IntCompensation, temperature
+            and humidity are identical and pressure is within +-7 Pa. The
+            largest difference measured over a dense grid of the operating
+            range was 6.6 Pa, near 1100 hPa, with the datasheet calibration.
+        """
+        # indexing, as unpacking an array allocates an iterator
+        raw_temp = raw[0]
+        raw_press = raw[1]
+        raw_hum = raw[2]
+        T1x2, T2h, T2l, T1, T3, P6, P5, P4x65536, P3, P2, P1h, P1l, P9, P8, \
+            P7, H4x64, H5, H6, H3, H2, H1 = self._coef
+        # temperature, (d * T2) >> 11
+        d = (raw_temp >> 3) - T1x2
+        var1 = ((d * T2h) + ((d * T2l) >> 5)) >> 6
+        var2 = (raw_temp >> 4) - T1
+        var2 = (((var2 * var2) >> 12) * T3) >> 14
+        t_fine = var1 + var2
+        self.t_fine = t_fine
+        temp = (t_fine * 5 + 128) >> 8
+
+        # pressure
+        if not self._osrs_p:
+            pressure = 0
+        else:
+            var1 = (t_fine >> 1) - 64000
+            # a2 = ((var1 >> 2) * (var1 >> 2)) >> 11
+            a = var1 >> 2
+            ah = a >> 6
+            al = a & 63
+            a2 = 2 * ah * ah + ((ah * al * 128 + al * al) >> 11)
+            var2 = a2 * P6
+            var2 = var2 + ((var1 * P5) << 1)
+            var2 = (var2 >> 2) + P4x65536
+            # var1 = (((P3 * (a2 >> 2)) >> 3) + ((P2 * var1) >> 1)) >> 18
+            vh = var1 >> 8
+            r = ((P3 * (a2 >> 2)) >> 3) + ((P2 * (var1 & 255)) >> 1)
+            var1 = ((r >> 7) + P2 * vh) >> 11
+            # var1 = ((32768 + var1) * P1) >> 15
+            c = 32768 + var1
+            var1 = (c * P1h + ((c * P1l) >> 8)) >> 7
+            if var1 == 0:
+                pressure = 0
+            else:
+                # p = (q * 3125 << 1) // var1
+                q = (1048576 - raw_press) - (var2 >> 12)
+                p = (q // var1) * 6250 + ((q % var1) * 6250) // var1
+                var1 = (P9 * (((p >> 3) * (p >> 3)) >> 13)) >> 12
+                var2 = ((p >> 2) * P8) >> 13
+                pressure = p + ((var1 + var2 + P7) >> 4)
+
+        # humidity
+        if not self._osrs_h:
+            humidity = 0
+        else:
+            x = t_fine - 76800
+            # a = ((raw_hum << 14) - (H4 << 20) - H5 * x + 16384) >> 15
+            d = raw_hum - H4x64
+            a = (d >> 1) + ((((d & 1) << 14) + 16384 - H5 * x) >> 15)
+            # b = ((((((x * H6) >> 10) * w) >> 10) + 2097152) * H2 +
+            #      8192) >> 14
+            u = (x * H6) >> 10
+            w = ((x * H3) >> 11) + 32768
+            c = u * (w >> 10) + ((u * (w & 1023)) >> 10) + 2097152
+            b = (c >> 14) * H2 + (((c & 16383) * H2 + 8192) >> 14)
+            # v = a * b, kept as v12 = v >> 12 and vr = v & 4095
+            u = a * (b >> 8)
+            m = ((u & 15) << 8) + a * (b & 255)
+            v12 = (u >> 4) + (m >> 12)
+            s = v12 >> 3
+            if v12 < 0:
+                humidity = 0
+            elif s > 32767:
+                # above 256 %RH, the correction below cannot bring it back
+                # into range, but s * s would not fit
+                humidity = 102400
+            else:
+                # humidity = (v - ((((s * s) >> 7) * H1) >> 4)) >> 12
+                h = v12 + (((m & 4095) - ((((s * s) >> 7) * H1) >> 4)) >> 12)
+                humidity = 102400 if h > 102400 else h
+
+        result[i] = temp
+        result[i + 1] = pressure
+        result[i + 2] = humidity
+
+
+class BME280(bme280_core.BME280):
+    engine = Int32Compensation
@@ -0,0 +1,116 @@
+"""
+Quantities derived from one compensated BME280 sample, computed together in
+a single pass, so that a single conversion is enough for all of them.
+
+The inputs are temperature in degC, pressure in Pa and relative humidity
+in %RH, BME280.metrics_from converts the engine units.
+
+The Magnus constants used for the dew point and the saturation vapour
+pressure are the ones of the Sensirion application note (17.62, 243.12),
+the heat index is the NWS Rothfusz regression.
+
+With fast=True, log and exp are replaced by short polynomial
+approximations (range reduction with frexp/ldexp and 3 resp. 6 terms),
+which avoid the powf/logf/expf library calls on the softfloat ESP8266.
+Over -40..85 degC, 300..1100 hPa and 1..100 %RH, the deviation from the
+exact formulas is below:
+
+    altitude            0.02 m
+    dew point           0.0001 degC
+    absolute humidity   relative 1e-5
+    sea level pressure  0.5 Pa for elevations up to 3000 m
+
+which is well below the sensor accuracy. The heat index uses no
+transcendental functions and is the same in both modes.
+"""
+from math import exp, frexp, ldexp, log, sqrt
+
+# Indices into the metrics output
+ALTITUDE = const(0)
+DEW_POINT = const(1)
+ABSOLUTE_HUMIDITY = const(2)
+HEAT_INDEX = const(3)
+SEALEVEL_PRESSURE = const(4)
+
+_NAN = float('nan')
+
+
+def _ln(x):
+    # x = m * 2**e, with m moved into [0.707, 1.414)
+    m, e = frexp(x)
+    if m < 0.7071067811865476:
+        m *= 2
+        e -= 1
+    # ln(m) = 2 * atanh(s) = 2 * (s + s**3 / 3 + s**5 / 5 ...)
+    s = (m - 1) / (m + 1)
+    s2 = s * s
+    return (e * 0.6931471805599453 +
+            s * (2.0 + s2 * (0.6666666666666666 + s2 * 0.4)))
+
+
+def _exp(x):
+    # exp(x) = 2**k * exp(r), with |r| <= ln(2) / 2
+    k = int(x * 1.4426950408889634 + (0.5 if x >= 0 else -0.5))
+    r = x - k * 0.6931471805599453
+    return ldexp(1.0 + r * (1.0 + r * (0.5 + r * (0.16666666666666666 + r * (
+        0.041666666666666664 + r * 0.008333333333333333)))), k)
+
+
+def heat_index(t, h):
+    """ Heat index in degC for temperature t in degC and humidity h in %RH.
+    """
+    t = t * 1.8 + 32
+    hi = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + h * 0.094)
+    if hi + t >= 160:
+        hi = (-42.379 + 2.04901523 * t + 10.14333127 * h -
+              0.22475541 * t * h - 0.00683783 * t * t -
+              0.05481717 * h * h + 0.00122874 * t * t * h +
+              0.00085282 * t * h * h - 0.00000199 * t * t * h * h)
+        if h < 13 and 80 <= t <= 112:
+            hi -= (13 - h) / 4 * sqrt((17 - abs(t - 95)) / 17)
+        elif h > 85 and 80 <= t <= 87:
+            hi += (h - 85) / 10 * (87 - t) / 5
+    return (hi - 32) / 1.8
+
+
+def metrics(t, p, h, out, sealevel=101325, elevation=0, fast=False):
+    """ Computes the derived quantities of one sample.
+
+        Args:
+            t: temperature in degC
+            p: pressure in Pa
+            h: relative humidity in %RH
+            out: array("f") or alike of length 5, filled with altitude in m,
+            dew point in degC, absolute humidity in g/m3, heat index in degC
+            and pressure reduced to sea level in Pa, see the index constants
+            sealevel: pressure at sea level in Pa, for the altitude
+            elevation: elevation of the sensor in m, for the sea level
+            pressure
+            fast: use the polynomial log/exp approximations
+
+        Returns:
+            out
+    """
+    ln = _ln if fast else log
+    ex = _exp if fast else exp
+
+    if p > 0:
+        out[ALTITUDE] = 44330 * (1.0 - ex(0.1903 * ln(p / sealevel)))
+        out[SEALEVEL_PRESSURE] = p * ex(-5.255 * ln(1.0 - elevation / 44330))
+    else:
+        out[ALTITUDE] = 0.0
+        out[SEALEVEL_PRESSURE] = 0.0
+
+    # Magnus formula, the saturation vapour pressure is
+    # 6.112 hPa * exp(m)
+    m = 17.62 * t / (243.12 + t)
+    if h > 0:
+        g = ln(h / 100) + m
+        out[DEW_POINT] = 243.12 * g / (17.62 - g)
+        out[ABSOLUTE_HUMIDITY] = 1324.5 * h / 100 * ex(m) / (273.15 + t)
+    else:
+        out[DEW_POINT] = _NAN
+        out[ABSOLUTE_HUMIDITY] = 0.0
+
+    out[HEAT_INDEX] = heat_index(t, h)
+    return out
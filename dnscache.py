@@ -0,0 +1,73 @@
+"""
+Caches host name lookups in the RTC memory, so that most wakes do without
+any DNS round trip, and all users of a host share one lookup per wake.
+
+Entries expire after TTL seconds of RTC time, and should be invalidated by
+the caller when connecting to the address fails.
+"""
+try:
+    import usocket
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    import socket as usocket
+    from struct import pack_into, unpack_from
+import utime
+import rtcmem
+
+# seconds a resolved address is used
+TTL = const(21600)
+
+_cache = None
+
+
+def _load():
+    global _cache
+    _cache = {}
+    mem = rtcmem.get(rtcmem.T_DNS)
+    if mem is None:
+        return
+    # host length (1 byte) | host | address (4 bytes) | expiry (4 bytes)
+    i = 0
+    while i < len(mem):
+        n = mem[i]
+        host = bytes(mem[i + 1:i + 1 + n]).decode()
+        addr = '.'.join(str(b) for b in mem[i + 1 + n:i + 5 + n])
+        _cache[host] = (addr, unpack_from('<I', mem, i + 5 + n)[0])
+        i += n + 9
+
+
+def _save():
+    mem = bytearray(sum(len(h) + 9 for h in _cache))
+    i = 0
+    for host, (addr, expires) in _cache.items():
+        n = len(host)
+        mem[i] = n
+        mem[i + 1:i + 1 + n] = host.encode()
+        mem[i + 1 + n:i + 5 + n] = bytes(int(b) for b in addr.split('.'))
+        pack_into('<I', mem, i + 5 + n, expires)
+        i += n + 9
+    rtcmem.put(rtcmem.T_DNS, mem)
+
+
+def resolve(host):
+    """ Returns the IPv4 address of host as a string. """
+    if _cache is None:
+        _load()
+    now = utime.time()
+    entry = _cache.get(host)
+    # also distrust entries that expire too far ahead, after the RTC was
+    # set back
+    if entry is not None and 0 <= entry[1] - now <= TTL:
+        return entry[0]
+    addr = usocket.getaddrinfo(host, 0)[0][-1][0]
+    _cache[host] = (addr, now + TTL)
+    _save()
+    return addr
+
+
+def invalidate(host):
+    """ Drops the cached address of host, e.g. after connecting failed. """
+    if _cache is None:
+        _load()
+    if _cache.pop(host, None) is not None:
+        _save()
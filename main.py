@@ -1,3 +1,7 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 from umqtt.simple import MQTTClient
 import machine
 from machine import Pin, I2C, ADC
@@ -6,20 +10,98 @@ import network
 import utime
 import esp
 import usyslog
-import ntptime
 import time
 import webrepl
 import json
+import rtcmem
+import dnscache
+import timesync
+import samplebuf
+import scheduler
+import status
+from mqttbatch import BatchPublisher
+try:
+    from ubinascii import crc32
+    from ustruct import pack, pack_into, unpack, unpack_from
+except ImportError:
+    from binascii import crc32
+    from struct import pack, pack_into, unpack, unpack_from
 
 client_id = 'cripple'
 
+# host of the MQTT broker and the syslog server
+SERVER = 'nas.lan'
+
+# least severe syslog severity sent to the server and printed
+SYSLOG_LEVEL = usyslog.S_INFO
+PRINT_LEVEL = usyslog.S_DEBUG
+
+# LED patterns of the wake phases: status.BLINK blinks the phase number,
+# and stays awake until the blinks are shown, status.PULSE only flashes the
+# LED shortly, status.OFF leaves it off
+LED_MODE = status.PULSE
+
+# publish all readings as one JSON payload to ~/sensors, instead of one
+# message per reading
+JSON_STATE = False
+
+# the discovery configs are retained by the broker, they are only
+# republished after a cold boot, when they changed, or every that many wakes
+DISCOVERY_EVERY = 144
+# bump when changing the discovery configs
+DISCOVERY_VERSION = 2
+
+# ms to wait for the association with the access point of the last wake,
+# before falling back to a full scan with DHCP
+FAST_CONNECT_TIMEOUT = 3000
+# ms between connection state polls
+CONNECT_POLL = 20
+# seconds after the full connection that fast ones reuse its DHCP lease,
+# keep it below the lease time of the DHCP server
+LEASE_RENEW = 12 * 3600
+
+# buffered readings are published in JSON lists of that many
+BACKLOG_CHUNK = 16
+# battery ADC reading per volt
+ADC_PER_VOLT = 239.0
+
+# esp.deepsleep option that disables the radio on the next wake
+_RF_DISABLED = const(4)
+# seconds between the Unix epoch and the MicroPython one
+_UNIX_2000 = const(946684800)
+
+# The sensor entities, driving the discovery configs and the readings:
+# state topic and JSON key, discovery object id, unique id suffix, device
+# class, name, unit, the function computing the value from the BME280
+# sample and the ADC reading, the deadband and the max silence in seconds.
+# A value is only published when it moved more than the deadband since it
+# was last published, or after the max silence. Wakes without anything to
+# publish buffer the reading and keep the radio disabled.
+ENTITIES = (
+    ('temperature', 'temperature', 'temp', 'temperature', 'Temperature',
+     '°C', lambda sample, adc: sample[0]/100, 0.3, 3600),
+    ('pressure', 'pressure', 'pressure', 'pressure', 'Pressure',
+     'hPa', lambda sample, adc: sample[1]/25600, 0.5, 3600),
+    ('humidity', 'humidity', 'humidity', 'humidity', 'Humidity',
+     '%', lambda sample, adc: sample[2]/1024, 2.0, 3600),
+    ('voltage', 'battery', 'voltage', 'battery', 'Battery',
+     'V', lambda sample, adc: adc/ADC_PER_VOLT, 0.05, 21600),
+)
+
+# indices into topics(), followed by the state topics and then the
+# discovery config topics of ENTITIES
+T_STATE = const(0)
+T_STATUS = const(1)
+T_SENSORS = const(2)
+T_BACKLOG = const(3)
+T_ENTITIES = const(4)
+
 class PrintClient(usyslog.SyslogClient):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, level=usyslog.S_DEBUG, formatter=None):
+        super().__init__(level=level, formatter=formatter)
 
     def log(self, severity, msg):
-        data = "<%d>%s" % (severity + (self._facility << 3), msg)
-        print(data)
+        print(self.formatter.format(severity, msg).decode())
         
     def close(self):
         pass
@@ -27,44 +109,115 @@ class PrintClient(usyslog.SyslogClient):
 
 
 class CombineClient(usyslog.SyslogClient):
-    def __init__(self, loggers):
+    def __init__(self, loggers, formatter=None):
         self.loggers = loggers
-        super().__init__()
+        super().__init__(formatter=formatter)
+        if formatter is not None:
+            for log in loggers:
+                log.formatter = formatter
+
+    def admits(self, severity):
+        for log in self.loggers:
+            if log.admits(severity):
+                return True
+        return False
 
     def log(self, severity, msg):
         for log in self.loggers:
-            log.log(severity, msg)
+            if log.admits(severity):
+                log.log(severity, msg)
+
+    def flush(self):
+        for log in self.loggers:
+            log.flush()
 
     def close(self):
         pass
 
 
 
-log = PrintClient()
+log = PrintClient(PRINT_LEVEL)
+
+
+status.mode = LED_MODE
+status.phase('boot', 1)
 
 
-def blink(times=1):
-    led = Pin(2, Pin.OUT)
-    for _ in range(times):
-        led.off()
-        utime.sleep_ms(100)
-        led.on()
-        utime.sleep_ms(200)
+
+async def wait_connected(nic, timeout=None):
+    start = utime.ticks_ms()
+    while not nic.isconnected():
+        if timeout is not None and \
+                utime.ticks_diff(utime.ticks_ms(), start) > timeout:
+            return False
+        await asyncio.sleep(CONNECT_POLL / 1000)
+    return True
+
+
+
+async def fast_connect(nic, cached):
+    """ Connects to the access point of the last wake, using its DHCP lease
+        as static configuration, which skips most of the scan and DHCP.
+    """
+    nic.ifconfig(tuple('.'.join(str(b) for b in cached[i:i + 4])
+                       for i in range(6, 22, 4)))
+    nic.connect(bssid=cached[:6])
+    print("Waiting for fast connection...")
+    if await wait_connected(nic, FAST_CONNECT_TIMEOUT):
+        return
+    # the static configuration stays active until a restart, so restart
+    # through a short deep sleep, like wake_radio, and take the full scan
+    # and DHCP path without the cache. A soft reset would not count as a
+    # deep sleep wake, and the next go_to_sleep would not sleep.
+    print("Fast connection failed")
+    rtcmem.remove(rtcmem.T_WIFI)
+    rtcmem.save()
+    esp.deepsleep(1000)
+
+
+
+def cache_network(nic):
+    """ Stores the BSSID and the DHCP lease in the RTC memory, followed by
+        the time they were obtained.
+    """
+    essid = nic.config('essid')
+    channel = nic.config('channel')
+    # the station interface does not report the BSSID, look it up
+    aps = [ap for ap in nic.scan() if ap[0].decode() == essid and
+           ap[2] == channel]
+    if not aps:
+        return
+    bssid = max(aps, key=lambda ap: ap[3])[1]
+    lease = bytes(int(b) for addr in nic.ifconfig() for b in addr.split('.'))
+    rtcmem.put(rtcmem.T_WIFI, bssid + lease + pack('<I', utime.time()))
 
 
 
-blink(1)
+def cached_network():
+    """ Returns what cache_network stored, or None if there is nothing, or
+        the lease is due for renewal.
+    """
+    cached = rtcmem.get(rtcmem.T_WIFI)
+    if cached is None or len(cached) != 26:
+        return None
+    # a lease obtained before the clock was set looks expired
+    age = utime.time() - unpack_from('<I', cached, 22)[0]
+    return cached if 0 <= age < LEASE_RENEW else None
 
 
 
-def init_network():
+async def init_network():
     nic = network.WLAN(network.STA_IF)
     nic.active(True)
     if not nic.isconnected():
-        nic.connect()
-        print("Waiting for connection...")
-        while not nic.isconnected():
-            utime.sleep(1)
+        cached = cached_network()
+        if cached is not None:
+            await fast_connect(nic, cached)
+        else:
+            nic.connect()
+            print("Waiting for connection...")
+            await wait_connected(nic)
+            cache_network(nic)
 
     print(nic.ifconfig())
     global client_id
@@ -74,25 +227,66 @@ def init_network():
 
 def get_logger():
     global log
-    log = CombineClient([usyslog.UDPClient('nas.lan'), PrintClient()])
+    formatter = usyslog.RFC5424Formatter(
+        client_id, 'esp8266-bme280', 'wake',
+        {'origin': {'software': 'esp8266-bme280'}})
+    log = CombineClient([
+        usyslog.BufferedUDPClient(dnscache.resolve(SERVER), level=SYSLOG_LEVEL),
+        PrintClient(PRINT_LEVEL)], formatter)
+
+
+
+def topics():
+    return (['{}/{}'.format(client_id, name)
+             for name in ('state', 'status', 'sensors', 'backlog')] +
+            ['{}/{}'.format(client_id, e[0]) for e in ENTITIES] +
+            ['homeassistant/sensor/{}/{}/config'.format(client_id, e[1])
+             for e in ENTITIES])
 
 
 
 def connect_mqtt():
-    mqtt = MQTTClient(client_id, 'nas.lan', keepalive=60)
+    mqtt = MQTTClient(client_id, dnscache.resolve(SERVER), keepalive=60)
     mqtt.set_last_will('{}/state'.format(client_id), 'offline', retain=True)
-    mqtt.connect()
+    try:
+        mqtt.connect()
+    except OSError:
+        # the cached address may be stale
+        dnscache.invalidate(SERVER)
+        raise
     log.info('MQTT connected')
 
-    mqtt.publish(
-        '{}/state'.format(client_id),
-        'online', retain=False)
+    pub = BatchPublisher(mqtt, topics())
+    # retained, the node is only connected for a moment between long sleeps
+    pub.queue(T_STATE, 'online', retain=True)
+
+    return mqtt, pub
+
 
-    return mqtt
 
+def discovery_due():
+    """ Tells whether the discovery configs need to be published, and
+        counts the wake in the RTC memory.
+    """
+    # MAX_SLEEP goes into expire_after
+    fingerprint = crc32('{} {} {} {} {}'.format(
+        DISCOVERY_VERSION, client_id, JSON_STATE, scheduler.MAX_SLEEP,
+        [e[:6] + e[8:] for e in ENTITIES]).encode()) & 0xffffffff
+    mem = rtcmem.get(rtcmem.T_DISCOVERY)
+    due = True
+    wakes = 0
+    if mem is not None and machine.reset_cause() == machine.DEEPSLEEP_RESET:
+        last, wakes = unpack('<IH', mem)
+        wakes += 1
+        due = last != fingerprint or wakes >= DISCOVERY_EVERY
+    if due:
+        wakes = 0
+    rtcmem.put(rtcmem.T_DISCOVERY, pack('<IH', fingerprint, wakes))
+    return due
 
 
-def publish_config(mqtt):
+
+def publish_config(pub):
     device = {
         "manufacturer": "bilbas",
         "model": "esp8266-bme280",
@@ -101,169 +295,262 @@ def publish_config(mqtt):
         ]
     }
 
-    temp_topic = 'homeassistant/sensor/{}/temperature/config'.format(client_id)
-    temp_config = {
-        "device": device,
-        "~": client_id,
-        "unique_id": "{}_temp".format(client_id),
-        "device_class": "temperature",
-        "name": "Temperature",
-        "state_topic": "~/temperature",
-        "unit_of_measurement": "°C"
-    }
+    for i, (key, _, unique_id, device_class, name, unit, _, _, silence) in \
+            enumerate(ENTITIES):
+        config = {
+            "device": device,
+            "~": client_id,
+            "unique_id": "{}_{}".format(client_id, unique_id),
+            "device_class": device_class,
+            "name": name,
+            "unit_of_measurement": unit,
+            "availability_topic": "~/state",
+            # values are republished at least every max silence, allow for
+            # the longest sleep on top
+            "expire_after": silence + 2 * scheduler.MAX_SLEEP
+        }
+        if JSON_STATE:
+            config["state_topic"] = "~/sensors"
+            config["value_template"] = "{{{{ value_json.{} }}}}".format(key)
+        else:
+            config["state_topic"] = "~/{}".format(key)
+
+        pub.queue(T_ENTITIES + len(ENTITIES) + i, json.dumps(config),
+                  retain=True)
+
+
+
+async def read_sensors():
+    """ Reads the BME280 and the ADC, yielding during the conversion. """
+    i2c = I2C(scl=Pin(5), sda=Pin(4), freq=10000)
+    bme = BME280(i2c=i2c, calibration=rtcmem.get(rtcmem.T_BME280))
+    rtcmem.put(rtcmem.T_BME280, bme.calibration)
+    await asyncio.sleep(bme.start_measurement() / 1000000)
+    return bme.read_compensated_data(), ADC(0).read()
 
-    mqtt.publish(
-        temp_topic,
-        json.dumps(temp_config), retain=True)
-
-
-    pressure_topic = 'homeassistant/sensor/{}/pressure/config'.format(
-        client_id)
-    pressure_config = {
-        "device": device,
-        "~": client_id,
-        "unique_id": "{}_pressure".format(client_id),
-        "device_class": "pressure",
-        "name": "Pressure",
-        "state_topic": "~/pressure",
-        "unit_of_measurement": "hPa",
-        "availability_topic": "~/state"
-    }
 
-    mqtt.publish(
-        pressure_topic,
-        json.dumps(pressure_config), retain=True)
-
-
-    humidity_topic = 'homeassistant/sensor/{}/humidity/config'.format(
-        client_id)
-    humidity_config = {
-        "device": device,
-        "~": client_id,
-        "unique_id": "{}_humidity".format(client_id),
-        "device_class": "humidity",
-        "name": "Humidity",
-        "state_topic": "~/humidity",
-        "unit_of_measurement": "%",
-        "availability_topic": "~/state"
-    }
 
-    mqtt.publish(
-        humidity_topic,
-        json.dumps(humidity_config), retain=True)
-
-
-    battery_topic = 'homeassistant/sensor/{}/battery/config'.format(client_id)
-    battery_config = {
-        "device": device,
-        "~": client_id,
-        "unique_id": "{}_voltage".format(client_id),
-        "device_class": "battery",
-        "name": "Battery",
-        "state_topic": "~/voltage",
-        "unit_of_measurement": "V",
-        "availability_topic": "~/state"
-    }
+def record_sample(record):
+    """ Returns the BME280 sample of a samplebuf record. """
+    return (record[1], record[2] * 2560, record[3] * 10.24)
 
-    mqtt.publish(
-        battery_topic,
-        json.dumps(battery_config), retain=True)
 
 
+def buffer_sample(sample, adc):
+    samplebuf.append(utime.time(), sample[0], sample[1] // 2560,
+                     sample[2] * 100 // 1024, adc)
 
-def report_sensors(mqtt):
-    i2c = I2C(scl=Pin(5), sda=Pin(4), freq=10000)
-    bme = BME280(i2c=i2c)
 
-    (temp, pressure, humidity) = bme.read_compensated_data()
 
-    mqtt.publish(
-        '{}/temperature'.format(client_id),
-        str(temp/100), retain=False)
-    log.info('temp: {}'.format(temp/100))
+def report_due(values):
+    """ Returns the indices of the entities to publish: those that moved
+        more than their deadband since they were last published, or reached
+        their max silence. All of them after a cold boot.
+    """
+    mem = rtcmem.get(rtcmem.T_REPORTED)
+    if mem is None or len(mem) != 8 * len(ENTITIES) or \
+            machine.reset_cause() != machine.DEEPSLEEP_RESET:
+        return list(range(len(ENTITIES)))
+    now = utime.time()
+    due = []
+    for i, entity in enumerate(ENTITIES):
+        t, value = unpack_from('<If', mem, 8 * i)
+        if abs(values[i] - value) > entity[7] or now - t >= entity[8]:
+            due.append(i)
+    return due
+
+
+
+def heartbeat_due(seconds):
+    """ Tells whether an entity reaches its max silence within seconds. """
+    mem = rtcmem.get(rtcmem.T_REPORTED)
+    if mem is None or len(mem) != 8 * len(ENTITIES):
+        return True
+    now = utime.time() + seconds
+    for i, entity in enumerate(ENTITIES):
+        if now - unpack_from('<I', mem, 8 * i)[0] >= entity[8]:
+            return True
+    return False
+
+
 
-    mqtt.publish(
-        '{}/pressure'.format(client_id),
-        str(pressure/25600), retain=False)
-    log.info('pres: {}'.format(pressure/25600))
+def mark_reported(values, published):
+    """ Stores the time and the values of the published entities. """
+    mem = rtcmem.get(rtcmem.T_REPORTED)
+    mem = bytearray(8 * len(ENTITIES) if mem is None or
+                    len(mem) != 8 * len(ENTITIES) else mem)
+    now = utime.time()
+    for i in published:
+        pack_into('<If', mem, 8 * i, now, values[i])
+    rtcmem.put(rtcmem.T_REPORTED, mem)
 
-    mqtt.publish(
-        '{}/humidity'.format(client_id),
-        str(humidity/1024), retain=False)
-    log.info('humi: {}'.format(humidity/1024))
 
-    adc = ADC(0)
-    volts_reading = adc.read()
-    volts = volts_reading/239.0
 
-    mqtt.publish(
-        '{}/voltage'.format(client_id), str(volts), retain=False)
-    log.info('volt: {}'.format(volts))
+def publish_backlog(pub):
+    """ Publishes the buffered readings but the current one, as JSON lists
+        of objects with the Unix time and the entity values.
+    """
+    rows = []
+    for _, record in zip(range(samplebuf.count() - 1), samplebuf.records()):
+        sample = record_sample(record)
+        row = {'time': record[0] + _UNIX_2000}
+        for entity in ENTITIES:
+            row[entity[0]] = entity[6](sample, record[4])
+        rows.append(row)
+        if len(rows) == BACKLOG_CHUNK:
+            pub.queue(T_BACKLOG, json.dumps(rows))
+            rows = []
+    if rows:
+        pub.queue(T_BACKLOG, json.dumps(rows))
 
-    mqtt.publish(
-        '{}/status'.format(client_id), 'disconnected', retain=True)
+
+
+def report_sensors(pub, values, due):
+    """ Publishes the values of the entities with the indices in due, or
+        all of them with JSON_STATE. Returns the published indices.
+    """
+    for entity, value in zip(ENTITIES, values):
+        log.info('%s: %s', entity[0], value)
+    if JSON_STATE:
+        due = range(len(ENTITIES))
+        pub.queue(T_SENSORS, json.dumps(
+            {e[0]: value for e, value in zip(ENTITIES, values)}))
+    else:
+        for i in due:
+            pub.queue(T_ENTITIES + i, str(values[i]))
+
+    pub.queue(T_STATUS, 'disconnected', retain=True)
+    return due
 
 
 
 def set_sleep(sleep):
-    rtc = machine.RTC()
-    mem = b'{}'.format(sleep)
-    rtc.memory(mem)
+    rtcmem.put(rtcmem.T_SLEEP, pack('<I', sleep))
+    rtcmem.save()
+
+
+
+def wake_radio(due):
+    """ Restarts through a short deep sleep, as the radio is disabled on
+        this wake. The restarted wake publishes the entities with the
+        indices in due, even if its own readings are back within their
+        deadbands.
+    """
+    rtcmem.put(rtcmem.T_RADIO, b'\2' + bytes(due))
+    rtcmem.save()
+    esp.deepsleep(1000)
 
 
 
-def go_to_sleep(force=True):
-    log.info('go_to_sleep({})'.format(force))
+def go_to_sleep(force=True, radio=True):
+    log.debug('go_to_sleep(%s)', force)
+    status.phase('sleep')
+    log.info('phases (ms since boot): %s', status.timings())
     reset_cause = machine.reset_cause()
-    log.info('That was a reset #{}'.format(reset_cause))
+    log.debug('That was a reset #%s', reset_cause)
 
-    rtc = machine.RTC()
-    log.info('rtc created')
     # that's in microseconds
-    sleep = 10*60*1000*1000
-    mem = rtc.memory()
-    log.info('rtc memory read')
-    if mem != b'':
-        log.info('mem is {}'.format(mem))
-        sleep = int(mem)
+    sleep = scheduler.interval() * 1000000
+    mem = rtcmem.get(rtcmem.T_SLEEP)
+    log.debug('rtc memory read')
+    if mem is not None:
+        sleep = unpack('<I', mem)[0]
+        log.info('sleep is %s', sleep)
+    # esp.deepsleep raises OverflowError beyond a signed 32 bit int
+    sleep = min(sleep, scheduler.DEEPSLEEP_LIMIT * 1000000)
+    if radio:
+        rtcmem.remove(rtcmem.T_RADIO)
+    else:
+        rtcmem.put(rtcmem.T_RADIO, b'\1')
+    rtcmem.save()
 
     if not force and webrepl.client_s:
         log.info('webrepl connected, not going to sleep')
+        log.flush()
         return
 
     if force or reset_cause == machine.DEEPSLEEP_RESET or reset_cause == machine.WDT_RESET:
         log.info('going deep sleep')
-        esp.deepsleep(sleep)
+        status.finish()
+        log.flush()
+        esp.deepsleep(sleep, 0 if radio else _RF_DISABLED)
+    log.flush()
+
+
+
+async def sync_time():
+    try:
+        if await timesync.sync_async():
+            log.info('time synced')
+    except Exception as e:
+        log.error('Error: %s', e)
+
+
+
+async def wake():
+    """ Runs a wake cycle. The Wi-Fi association runs during the BME280
+        conversion. The NTP request goes out before the MQTT connection is
+        set up, so the server answers meanwhile, and the reply is read once
+        the readings are published.
+    """
+    # b'\1' when go_to_sleep disabled the radio, b'\2' and the indices of
+    # the entities due when wake_radio restarted to enable it
+    mem = rtcmem.get(rtcmem.T_RADIO)
+    radio = mem is None or mem[0] == 2
+    if radio:
+        network_task = asyncio.create_task(init_network())
+    sample, adc = await read_sensors()
+    status.phase('sensors')
+    scheduler.update(sample[0], sample[1] // 2560, adc / ADC_PER_VOLT)
+    buffer_sample(sample, adc)
+    values = [entity[6](sample, adc) for entity in ENTITIES]
+    due = report_due(values)
+    if mem is not None and mem[0] == 2:
+        due = sorted(set(due).union(mem[1:]))
+    if not due:
+        # the next wake needs the radio for a heartbeat
+        go_to_sleep(False, heartbeat_due(scheduler.interval()))
+        return
+    if not radio:
+        wake_radio(due)
+        return
+
+    await network_task
+    status.phase('network', 3)
+    get_logger()
+    ntp_task = asyncio.create_task(sync_time())
+    # let the task send the NTP request, the MQTT setup below blocks
+    await asyncio.sleep(0)
+
+    reset_cause = machine.reset_cause()
+    log.info('Reset cause: %s', reset_cause)
+
+    mqtt, pub = connect_mqtt()
+    if discovery_due():
+        publish_config(pub)
+        log.info('discovery published')
+    publish_backlog(pub)
+    published = report_sensors(pub, values, due)
+    pub.flush()
+    mqtt.disconnect()
+    log.info('MQTT disconnected')
+    samplebuf.clear()
+    mark_reported(values, published)
+    status.phase('published', 4)
+
+    await ntp_task
+    log.info('init %s', time.localtime())
+    go_to_sleep(False, heartbeat_due(scheduler.interval()))
 
 
 
 def main():
-    blink(2)
+    status.phase('wake', 2)
     try:
-        init_network()
-        get_logger()
-        try:
-            ntptime.settime()
-        except Exception as e:
-            log.error("Error: %s" % e)
-
-        localtime = time.localtime()
-        log.info('init {}'.format(localtime))
-
-        reset_cause = machine.reset_cause()
-        log.info("Reset cause: %s" % reset_cause)
-        blink(3)
-
-        mqtt = connect_mqtt()
-        publish_config(mqtt)
-        report_sensors(mqtt)
-        mqtt.disconnect()
-        log.info('MQTT disconnected')
-
-        blink(4)
-        go_to_sleep(False)
+        asyncio.run(wake())
     except Exception as e:
-        log.error("Error: %s" % e)
+        log.error('Error: %s', e)
+        log.flush()
 
 
 
@@ -0,0 +1,63 @@
+"""
+Queues MQTT QoS 0 publish packets in a buffer and sends them with a single
+socket write on flush, instead of the separate writes umqtt.simple does
+for the header, topic and payload of every message. QoS 0 needs no
+acknowledgement, so the packets can be pipelined.
+
+Topics are encoded once and referred to by their index.
+"""
+
+
+class BatchPublisher:
+    def __init__(self, mqtt, topics, size=1024):
+        """
+            Args:
+                mqtt: connected umqtt.simple.MQTTClient
+                topics: topic strings, queue refers to them by index
+                size: initial buffer size, the buffer is flushed when full
+        """
+        self._mqtt = mqtt
+        self._topics = [t.encode() for t in topics]
+        self._buf = bytearray(size)
+        self._len = 0
+
+    def queue(self, topic, msg, retain=False):
+        """ Queues a QoS 0 publish of msg (str or bytes) to the topic with
+            the index topic.
+        """
+        topic = self._topics[topic]
+        if isinstance(msg, str):
+            msg = msg.encode()
+        size = 2 + len(topic) + len(msg)
+        need = 2 + size
+        n = size >> 7
+        while n:
+            need += 1
+            n >>= 7
+        if self._len + need > len(self._buf):
+            self.flush()
+            if need > len(self._buf):
+                self._buf = bytearray(need)
+
+        buf = self._buf
+        i = self._len
+        buf[i] = 0x31 if retain else 0x30
+        i += 1
+        while size > 0x7f:
+            buf[i] = (size & 0x7f) | 0x80
+            size >>= 7
+            i += 1
+        buf[i] = size
+        buf[i + 1] = len(topic) >> 8
+        buf[i + 2] = len(topic) & 0xff
+        i += 3
+        buf[i:i + len(topic)] = topic
+        i += len(topic)
+        buf[i:i + len(msg)] = msg
+        self._len = i + len(msg)
+
+    def flush(self):
+        """ Sends all queued packets. """
+        if self._len:
+            self._mqtt.sock.write(memoryview(self._buf)[:self._len])
+            self._len = 0
@@ -0,0 +1,110 @@
+"""
+Keeps small pieces of state in the RTC user memory, so that they survive
+deep sleep.
+
+The memory starts with a header, followed by tagged slots:
+
+    magic (2 bytes) | length of the slots (2 bytes) | crc32 of the slots (4)
+    tag (1 byte) | size (1 byte) | data (size bytes)
+    ...
+
+If the header or the checksum do not match, e.g. after a power cycle or
+with memory written by an older firmware, all slots are dropped.
+
+The memory is read once on first access, changes are kept in RAM until
+save() is called, which should happen right before going to deep sleep.
+"""
+import machine
+try:
+    from ubinascii import crc32
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    from binascii import crc32
+    from struct import pack_into, unpack_from
+
+MAGIC = const(0xB280)
+# the esp8266 port offers 492 bytes of RTC user memory
+SIZE = const(492)
+
+# Slot tags
+T_SLEEP = const(1)
+T_BME280 = const(2)
+T_DISCOVERY = const(3)
+T_WIFI = const(4)
+T_DNS = const(5)
+T_NTP = const(6)
+T_SAMPLES = const(7)
+T_RADIO = const(8)
+T_SCHEDULE = const(9)
+T_REPORTED = const(10)
+
+_slots = None
+_dirty = False
+
+
+def _load():
+    global _slots
+    _slots = {}
+    mem = machine.RTC().memory()
+    if len(mem) < 8:
+        return
+    magic, length, crc = unpack_from('<HHI', mem)
+    if magic != MAGIC or length != len(mem) - 8:
+        return
+    if crc32(mem[8:]) & 0xffffffff != crc:
+        return
+    i = 8
+    while i + 2 <= len(mem):
+        size = mem[i + 1]
+        _slots[mem[i]] = mem[i + 2:i + 2 + size]
+        i += 2 + size
+
+
+def get(tag):
+    """ Returns the bytes stored for tag, or None. """
+    if _slots is None:
+        _load()
+    return _slots.get(tag)
+
+
+def put(tag, data):
+    """ Stores data (at most 255 bytes) for tag, to be written by save(). """
+    global _dirty
+    if _slots is None:
+        _load()
+    data = bytes(data)
+    if _slots.get(tag) == data:
+        return
+    if len(data) > 255:
+        raise ValueError('slot {} too large: {}'.format(tag, len(data)))
+    used = 8 + sum(2 + len(v) for k, v in _slots.items() if k != tag)
+    if used + 2 + len(data) > SIZE:
+        raise ValueError('RTC memory full, slot {} does not fit'.format(tag))
+    _slots[tag] = data
+    _dirty = True
+
+
+def remove(tag):
+    global _dirty
+    if _slots is None:
+        _load()
+    if _slots.pop(tag, None) is not None:
+        _dirty = True
+
+
+def save():
+    """ Writes the slots to the RTC memory, if anything changed. """
+    global _dirty
+    if not _dirty:
+        return
+    length = sum(2 + len(v) for v in _slots.values())
+    mem = bytearray(8 + length)
+    i = 8
+    for tag, data in _slots.items():
+        mem[i] = tag
+        mem[i + 1] = len(data)
+        mem[i + 2:i + 2 + len(data)] = data
+        i += 2 + len(data)
+    pack_into('<HHI', mem, 0, MAGIC, length, crc32(mem[8:]) & 0xffffffff)
+    machine.RTC().memory(mem)
+    _dirty = False
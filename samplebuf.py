@@ -0,0 +1,96 @@
+"""
+Buffers sensor records across deep sleep, so that the radio only needs to
+be enabled every few wakes, to upload them in one go.
+
+The records are delta encoded into samplecodec blocks. The open block is
+kept in the RTC memory slot T_SAMPLES, next to the other state rtcmem
+keeps. When it is full, it is moved to a file in flash, which keeps the
+newest FLASH_SIZE bytes of blocks.
+
+A record holds the time in seconds since 2000, the temperature in
+0.01 degC, the pressure in 0.1 hPa, the humidity in 0.01 %RH and the raw
+battery ADC reading.
+"""
+try:
+    import uos
+except ImportError:
+    import os as uos
+import rtcmem
+import samplecodec
+
+# bytes of the block kept in the RTC memory, before it is moved to flash
+RTC_BLOCK = const(200)
+FLASH_FILE = 'samples.bin'
+# bytes kept in flash, older blocks are dropped
+FLASH_SIZE = const(4096)
+
+
+def _read_flash():
+    try:
+        with open(FLASH_FILE, 'rb') as f:
+            return f.read()
+    except OSError:
+        return b''
+
+
+def _to_flash(block):
+    with open(FLASH_FILE, 'ab') as f:
+        f.write(block)
+    data = _read_flash()
+    if len(data) > FLASH_SIZE:
+        # the newest blocks that fit, or only the new one if the blocks
+        # before cannot be walked
+        start = len(data) - len(block)
+        for i in samplecodec.blocks(data):
+            if len(data) - i <= FLASH_SIZE:
+                start = min(i, start)
+                break
+        with open(FLASH_FILE, 'wb') as f:
+            f.write(data[start:])
+
+
+def count():
+    """ Returns the number of buffered records records() yields. """
+    n = 0
+    for _ in records():
+        n += 1
+    return n
+
+
+def append(t, temp, press, hum, adc):
+    """ Buffers a record, in the units described above. """
+    record = (t, temp, press, hum, adc)
+    block = rtcmem.get(rtcmem.T_SAMPLES)
+    new = None
+    if block is not None and \
+            len(block) + samplecodec.DELTA_SIZE <= RTC_BLOCK:
+        try:
+            new = samplecodec.encode(record, block)
+        except ValueError:
+            block = None
+    if new is None:
+        if block is not None:
+            _to_flash(block)
+        new = samplecodec.encode(record)
+    rtcmem.put(rtcmem.T_SAMPLES, new)
+
+
+def records():
+    """ Yields the buffered records as tuples, oldest first. Corrupt
+        blocks are skipped along with the ones after them.
+    """
+    for data in (_read_flash(), rtcmem.get(rtcmem.T_SAMPLES) or b''):
+        try:
+            for record in samplecodec.decode(data):
+                yield record
+        except ValueError:
+            pass
+
+
+def clear():
+    """ Drops all buffered records. """
+    rtcmem.remove(rtcmem.T_SAMPLES)
+    try:
+        uos.remove(FLASH_FILE)
+    except OSError:
+        pass
@@ -0,0 +1,116 @@
+"""
+Packs sensor records into compact blocks, for buffering them in the RTC
+memory and in flash. Runs on MicroPython as well as on CPython, so that
+buffered data can be decoded off the device.
+
+A record is a tuple of the time in seconds, the temperature in 0.01 degC,
+the pressure in 0.1 hPa, the humidity in 0.01 %RH and the raw battery ADC
+reading. A block holds up to 255 records: their number and the first
+record, then the difference of every further record to the one before it,
+as 16 bit values, then the crc32 of all that.
+
+    count (1) | time (4) | temp (2) | press (2) | hum (2) | adc (2)
+    dtime (2) | dtemp (2) | dpress (2) | dhum (2) | dadc (2)
+    ...
+    crc32 (4)
+
+Block boundaries follow from the counts, so blocks can be concatenated.
+"""
+try:
+    from ubinascii import crc32
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    from binascii import crc32
+    from struct import pack_into, unpack_from
+
+HEAD = '<BIhHHH'
+HEAD_SIZE = 13
+DELTA = '<Hhhhh'
+DELTA_SIZE = 10
+CRC_SIZE = 4
+
+
+def size(count):
+    """ Returns the size in bytes of a block of count records. """
+    return HEAD_SIZE + (count - 1) * DELTA_SIZE + CRC_SIZE
+
+
+def _seal(block):
+    end = len(block) - CRC_SIZE
+    pack_into('<I', block, end, crc32(block[:end]) & 0xffffffff)
+    return block
+
+
+def encode(record, block=None):
+    """ Appends a record to a block.
+
+        Args:
+            record: tuple of time, temperature, pressure, humidity and ADC
+            block: block to append to, or None to start a new one
+
+        Returns:
+            the new block, or None if the record does not fit into block,
+            as it is full or a difference does not fit into 16 bits
+    """
+    if block is None:
+        block = bytearray(size(1))
+        pack_into(HEAD, block, 0, 1, *record)
+        return _seal(block)
+
+    count = block[0]
+    if count == 255:
+        return None
+    for last in decode(block):
+        pass
+    d = [record[i] - last[i] for i in range(5)]
+    if not 0 <= d[0] <= 0xffff:
+        return None
+    for x in d[1:]:
+        if not -0x8000 <= x <= 0x7fff:
+            return None
+    end = len(block) - CRC_SIZE
+    new = bytearray(size(count + 1))
+    new[:end] = block[:end]
+    new[0] = count + 1
+    pack_into(DELTA, new, end, *d)
+    return _seal(new)
+
+
+def decode(data):
+    """ Yields the records of the blocks in data.
+
+        Raises:
+            ValueError: if a block is empty, truncated or corrupt
+    """
+    i = 0
+    while i < len(data):
+        count = data[i]
+        if not count:
+            raise ValueError('empty block')
+        end = i + size(count)
+        if end > len(data):
+            raise ValueError('truncated block')
+        crc = unpack_from('<I', data, end - CRC_SIZE)[0]
+        if crc32(data[i:end - CRC_SIZE]) & 0xffffffff != crc:
+            raise ValueError('bad block crc')
+        t, temp, press, hum, adc = unpack_from(HEAD, data, i)[1:]
+        yield t, temp, press, hum, adc
+        for j in range(i + HEAD_SIZE, end - CRC_SIZE, DELTA_SIZE):
+            dt, dtemp, dpress, dhum, dadc = unpack_from(DELTA, data, j)
+            t += dt
+            temp += dtemp
+            press += dpress
+            hum += dhum
+            adc += dadc
+            yield t, temp, press, hum, adc
+        i = end
+
+
+def blocks(data):
+    """ Returns the offsets of the blocks in data, without checking them. """
+    offsets = []
+    i = 0
+    while i < len(data) and data[i]:
+        offsets.append(i)
+        i += size(data[i])
+    return offsets
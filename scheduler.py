@@ -0,0 +1,92 @@
+"""
+Picks the next deep sleep interval from the recent readings.
+
+The interval grows while temperature and pressure are stable, and halves
+when either changes fast. A low battery doubles the bounds of the
+interval, as far as esp.deepsleep allows. The last reading and the
+interval are kept in the RTC memory slot T_SCHEDULE.
+"""
+try:
+    import utime
+    from ustruct import pack, unpack
+except ImportError:
+    import time as utime
+    from struct import pack, unpack
+import rtcmem
+
+# interval bounds in seconds
+MIN_SLEEP = const(120)
+DEFAULT_SLEEP = const(600)
+MAX_SLEEP = const(1800)
+# changes per 10 minutes in 0.01 degC and 0.1 hPa, above which the interval
+# halves, and below which it grows by half
+TEMP_FAST = const(50)
+PRESS_FAST = const(5)
+TEMP_STABLE = const(10)
+PRESS_STABLE = const(2)
+# battery voltage below which the bounds double
+LOW_BATTERY = 3.4
+# longest deep sleep in seconds, esp.deepsleep takes the us as a signed
+# 32 bit int
+DEEPSLEEP_LIMIT = const(2147)
+
+
+def policy(interval, dt, dtemp, dpress, volts):
+    """ Returns the next interval.
+
+        Args:
+            interval: current interval in seconds
+            dt: seconds since the last reading
+            dtemp: temperature change since then in 0.01 degC
+            dpress: pressure change since then in 0.1 hPa
+            volts: battery voltage
+
+        Returns:
+            the next interval in seconds
+    """
+    temp_rate = abs(dtemp) * 600 // dt
+    press_rate = abs(dpress) * 600 // dt
+    if temp_rate > TEMP_FAST or press_rate > PRESS_FAST:
+        interval //= 2
+    elif temp_rate <= TEMP_STABLE and press_rate <= PRESS_STABLE:
+        interval = interval * 3 // 2
+    shortest, longest = MIN_SLEEP, MAX_SLEEP
+    if volts < LOW_BATTERY:
+        shortest, longest = 2 * MIN_SLEEP, 2 * MAX_SLEEP
+    longest = min(longest, DEEPSLEEP_LIMIT)
+    return max(shortest, min(longest, interval))
+
+
+def update(temp, press, volts):
+    """ Adapts the interval to a reading.
+
+        Args:
+            temp: temperature in 0.01 degC
+            press: pressure in 0.1 hPa
+            volts: battery voltage
+
+        Returns:
+            the next interval in seconds
+    """
+    now = utime.time()
+    interval = DEFAULT_SLEEP
+    mem = rtcmem.get(rtcmem.T_SCHEDULE)
+    if mem is not None:
+        last, last_temp, last_press, interval = unpack('<IhHH', mem)
+        dt = now - last
+        if dt < MIN_SLEEP // 2:
+            # too close to the last reading to tell a rate, e.g. a restart
+            return interval
+        if dt <= 4 * MAX_SLEEP:
+            interval = policy(interval, dt, temp - last_temp,
+                              press - last_press, volts)
+    rtcmem.put(rtcmem.T_SCHEDULE, pack('<IhHH', now, temp, press, interval))
+    return interval
+
+
+def interval():
+    """ Returns the current interval in seconds. """
+    mem = rtcmem.get(rtcmem.T_SCHEDULE)
+    if mem is None:
+        return DEFAULT_SLEEP
+    return unpack('<IhHH', mem)[3]
@@ -0,0 +1,114 @@
+"""
+Shows the wake phases on the LED without blocking, and records when they
+were reached.
+
+The LED patterns run from a virtual machine.Timer. In BLINK mode, the
+n-th phase blinks the LED n times (100ms on, 200ms off). Patterns of
+phases reached while one is still running are queued, and separated by a
+pause, and finish() waits for them before deep sleep, which keeps the
+node awake for a few seconds. PULSE shows a single short pulse instead,
+which a newer pulse replaces, and OFF no pattern at all.
+"""
+import utime
+from machine import Pin, Timer
+
+OFF = const(0)
+PULSE = const(1)
+BLINK = const(2)
+
+mode = PULSE
+
+# ms per pattern step, a blink takes 3 steps: on, off, off
+STEP_MS = const(100)
+# steps off after a pattern, before the next one
+PAUSE_STEPS = const(4)
+PULSE_MS = const(20)
+
+_led = None
+_timer = None
+# steps left of the running pattern, including its pause
+_steps = 0
+# blink counts of the patterns waiting for the running one
+_queue = []
+_phases = []
+
+
+def _set(on):
+    # the LED is active low
+    _led.value(not on)
+
+
+def _tick(timer):
+    global _steps
+    _steps -= 1
+    if _steps > 0:
+        blink = _steps - PAUSE_STEPS
+        _set(blink > 0 and blink % 3 == 0)
+    elif _queue:
+        _start(_queue.pop(0))
+    else:
+        timer.deinit()
+        _set(False)
+
+
+def _start(times):
+    global _steps
+    _set(True)
+    if mode == PULSE:
+        _steps = 1
+        _timer.init(period=PULSE_MS, mode=Timer.ONE_SHOT, callback=_tick)
+    else:
+        _steps = 3 * times + PAUSE_STEPS
+        _timer.init(period=STEP_MS, mode=Timer.PERIODIC, callback=_tick)
+
+
+def _show(times):
+    global _led, _timer
+    if mode == OFF or not times:
+        return
+    if _led is None:
+        _led = Pin(2, Pin.OUT)
+        _timer = Timer(-1)
+    if mode == BLINK and _steps > 0:
+        _queue.append(times)
+        return
+    _timer.deinit()
+    _start(times)
+
+
+def phase(name, times=0):
+    """ Records that the wake reached a phase, and shows it on the LED.
+
+        Args:
+            name: name of the phase
+            times: number of blinks in BLINK mode, 0 for none
+    """
+    _phases.append((name, utime.ticks_ms()))
+    _show(times)
+
+
+def off():
+    """ Stops the running pattern and drops the queued ones. """
+    global _steps
+    if _timer is not None:
+        _timer.deinit()
+        _steps = 0
+        del _queue[:]
+        _set(False)
+
+
+def finish():
+    """ Waits for the running and queued BLINK patterns to end, then stops
+        any pattern, e.g. before deep sleep.
+    """
+    if mode == BLINK and _steps > 0:
+        steps = _steps - PAUSE_STEPS
+        for times in _queue:
+            steps += 3 * times + PAUSE_STEPS
+        utime.sleep_ms(max(0, steps) * STEP_MS)
+    off()
+
+
+def timings():
+    """ Returns the phases with the ms since boot they were reached at. """
+    return _phases
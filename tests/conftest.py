@@ -0,0 +1,14 @@
+import time
+
+import pytest
+
+import host
+
+host.install()
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """ Skips the waits for the BME280 conversions. """
+    monkeypatch.setattr(time, 'sleep_ms', lambda t: None)
+    monkeypatch.setattr(time, 'sleep_us', lambda t: None)
@@ -0,0 +1,27 @@
+"""
+Makes the modules of this repository importable on CPython, for the tests
+and the tools in tools/: puts the repository, this directory and the
+MicroPython module stubs in stubs/ on sys.path, and adds the MicroPython
+builtins and time functions the modules use.
+"""
+import builtins
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def install():
+    for path in (os.path.join(HERE, 'stubs'), HERE, ROOT):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    builtins.const = lambda x: x
+    if not hasattr(time, 'ticks_us'):
+        time.ticks_us = lambda: int(time.perf_counter() * 1000000)
+        time.ticks_ms = lambda: int(time.perf_counter() * 1000)
+        time.ticks_add = lambda t, delta: t + delta
+        time.ticks_diff = lambda a, b: a - b
+        time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+        time.sleep_us = lambda us: time.sleep(us / 1000000)
@@ -0,0 +1,97 @@
+"""
+Boots main.py on CPython against the stubs in stubs/, with an NTP server
+on localhost. The syslog datagrams go to localhost as well.
+"""
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+import host
+
+host.install()
+import machine  # noqa: E402
+import stublog  # noqa: E402
+import usocket  # noqa: E402
+import utime  # noqa: E402
+
+# seconds between the NTP epoch (1900) and the Unix one
+NTP_UNIX = 2208988800
+
+
+class NTPServer(threading.Thread):
+    """ Answers NTP queries after delay_ms, with the time of the host. """
+
+    def __init__(self, delay_ms=30):
+        super().__init__(daemon=True)
+        self.delay_ms = delay_ms
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        usocket.ports[123] = self.sock.getsockname()[1]
+        self.start()
+
+    def run(self):
+        while True:
+            try:
+                query, addr = self.sock.recvfrom(48)
+            except OSError:
+                return
+            stublog.record('ntp request')
+            time.sleep(self.delay_ms / 1000)
+            reply = bytearray(48)
+            reply[0] = 0x1C
+            struct.pack_into('!I', reply, 40, int(time.time()) + NTP_UNIX)
+            self.sock.sendto(reply, addr)
+
+    def close(self):
+        usocket.ports.pop(123, None)
+        self.sock.close()
+
+
+def _forget():
+    # a boot starts without the modules of the last one, only the RTC
+    # memory, the flash and the RTC stay
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None) or ''
+        if os.path.dirname(os.path.abspath(path)) == host.ROOT:
+            del sys.modules[name]
+
+
+def boot(cause=machine.DEEPSLEEP_RESET):
+    """ Runs main.py once after a reset with cause, in the current
+        directory, which holds the flash files. The stub log then holds
+        what the wake did, from 'boot' on, and the status phases.
+
+        Returns:
+            the message of the SystemExit the wake ended with, e.g. from
+            esp.deepsleep, or None if main.py returned without sleeping
+    """
+    _forget()
+    machine.cause = cause
+    del stublog.entries[:]
+    stublog.record('boot')
+    try:
+        import main  # noqa: F401
+    except SystemExit as e:
+        return str(e)
+    finally:
+        # add the phases main.py went through to the log
+        status = sys.modules.get('status')
+        if status is not None:
+            stublog.entries.extend((ms, 'phase', name)
+                                   for name, ms in status.timings())
+            stublog.entries.sort(key=lambda e: e[0])
+        _forget()
+    return None
+
+
+def sleep(seconds):
+    """ Advances the time by a deep sleep. """
+    utime.offset += seconds
+
+
+def events(name):
+    """ Returns the stub log entries of name, of the last boot. """
+    return [e for e in stublog.entries if e[1] == name]
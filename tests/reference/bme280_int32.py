@@ -0,0 +1,91 @@
+# Reference copy of the literal transcription of the datasheet 32 bit
+# formulas, for tools/record_vectors.py. Do not change.
+# BME280 compensation using only the 32 bit integer formulas of the Bosch
+# Data Sheet, Document BST-BME280-DS002-15, section 8.2. Pressure is less
+# precise than with the 64 bit formulas of bme280_int (1 Pa instead of
+# 1/256 Pa), but the intermediate values stay a lot smaller.
+
+import bme280_core
+# constants, re-exported for compatibility
+from bme280_core import *
+
+
+class Int32Compensation:
+    """ Compensation using the 32 bit integer formulas of the datasheet.
+
+        Temperature is in 0.01 degC, pressure in Pa and humidity in Q22.10
+        %RH (1/1024 %RH).
+    """
+
+    typecode = "i"
+    # divisors to get degC, Pa and %RH
+    scale = (100, 1, 1024)
+
+    def __init__(self, sensor):
+        # loop invariant parts of the formulas, see IntCompensation
+        s = sensor
+        self._coef = (
+            s.dig_T1 * 2, s.dig_T2, s.dig_T1, s.dig_T3,
+            s.dig_P6, s.dig_P5, s.dig_P4 << 16, s.dig_P3, s.dig_P2, s.dig_P1,
+            s.dig_P9, s.dig_P8, s.dig_P7,
+            16384 - (s.dig_H4 << 20), s.dig_H5, s.dig_H6,
+            s.dig_H3, s.dig_H2, s.dig_H1)
+        self._osrs_p = s._osrs_p
+        self._osrs_h = s._osrs_h
+        self.t_fine = 0
+
+    def compensate(self, raw, result, i):
+        """ Compensates the raw temperature, pressure, humidity triple and
+            stores it in result, starting at index i.
+        """
+        raw_temp, raw_press, raw_hum = raw
+        T1x2, T2, T1, T3, P6, P5, P4x65536, P3, P2, P1, P9, P8, P7, \
+            H_off, H5, H6, H3, H2, H1 = self._coef
+        # temperature
+        var1 = (((raw_temp >> 3) - T1x2) * T2) >> 11
+        var2 = (raw_temp >> 4) - T1
+        var2 = (((var2 * var2) >> 12) * T3) >> 14
+        t_fine = var1 + var2
+        self.t_fine = t_fine
+        temp = (t_fine * 5 + 128) >> 8
+
+        # pressure
+        if not self._osrs_p:
+            pressure = 0
+        else:
+            var1 = (t_fine >> 1) - 64000
+            var2 = (((var1 >> 2) * (var1 >> 2)) >> 11) * P6
+            var2 = var2 + ((var1 * P5) << 1)
+            var2 = (var2 >> 2) + P4x65536
+            var1 = (((P3 * (((var1 >> 2) * (var1 >> 2)) >> 13)) >> 3) +
+                    ((P2 * var1) >> 1)) >> 18
+            var1 = ((32768 + var1) * P1) >> 15
+            if var1 == 0:
+                pressure = 0
+            else:
+                p = ((1048576 - raw_press) - (var2 >> 12)) * 3125
+                p = (p << 1) // var1
+                var1 = (P9 * (((p >> 3) * (p >> 3)) >> 13)) >> 12
+                var2 = ((p >> 2) * P8) >> 13
+                pressure = p + ((var1 + var2 + P7) >> 4)
+
+        # humidity
+        if not self._osrs_h:
+            humidity = 0
+        else:
+            h = t_fine - 76800
+            h = (((((raw_hum << 14) + H_off) - (H5 * h)) >> 15) *
+                 (((((((h * H6) >> 10) * (((h * H3) >> 11) + 32768)) >> 10) +
+                    2097152) * H2 + 8192) >> 14))
+            h = h - (((((h >> 15) * (h >> 15)) >> 7) * H1) >> 4)
+            h = 0 if h < 0 else h
+            h = 419430400 if h > 419430400 else h
+            humidity = h >> 12
+
+        result[i] = temp
+        result[i + 1] = pressure
+        result[i + 2] = humidity
+
+
+class BME280(bme280_core.BME280):
+    engine = Int32Compensation
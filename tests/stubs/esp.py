@@ -0,0 +1,13 @@
+"""
+Stand-in for the esp module: deepsleep ends the program, like it ends the
+wake on the device.
+"""
+import stublog
+
+
+def deepsleep(time_us=0, option=0):
+    # the port converts to a machine int
+    if not -0x80000000 <= time_us <= 0x7fffffff:
+        raise OverflowError('overflow converting long int to machine word')
+    stublog.record('deepsleep', time_us, option)
+    raise SystemExit('esp.deepsleep({}, {})'.format(time_us, option))
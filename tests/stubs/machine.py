@@ -0,0 +1,110 @@
+"""
+Stand-in for the MicroPython machine module of the esp8266 port, with a
+fake BME280 on the I2C bus.
+"""
+from fakei2c import FakeI2C
+import stublog
+
+PWRON_RESET = 0
+WDT_RESET = 1
+SOFT_RESET = 4
+DEEPSLEEP_RESET = 5
+HARD_RESET = 6
+
+# returned by reset_cause() and ADC(0).read()
+cause = PWRON_RESET
+adc = 980
+
+_memory = b''
+_datetime = (2000, 1, 1, 6, 0, 0, 0, 0)
+
+
+def reset_cause():
+    return cause
+
+
+def reset():
+    stublog.record('reset')
+    raise SystemExit('machine.reset()')
+
+
+def unique_id():
+    return b'\x8c\xaa\xb5\x01\x02\x03'
+
+
+class RTC:
+    def memory(self, data=None):
+        global _memory
+        if data is None:
+            return _memory
+        assert len(data) <= 492, len(data)
+        _memory = bytes(data)
+
+    def datetime(self, datetimetuple=None):
+        global _datetime
+        if datetimetuple is None:
+            return _datetime
+        _datetime = tuple(datetimetuple)
+        stublog.record('rtc', _datetime)
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, id, mode=-1, *args, **kwargs):
+        self.id = id
+        self._value = 0
+
+    def value(self, x=None):
+        if x is None:
+            return self._value
+        self._value = int(bool(x))
+        stublog.record('pin', self.id, self._value)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+
+def I2C(*args, **kwargs):
+    return FakeI2C()
+
+
+class ADC:
+    def __init__(self, id):
+        pass
+
+    def read(self):
+        return adc
+
+
+class Timer:
+    """ Only expires when fire() is called. """
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1):
+        self.callback = None
+
+    def init(self, period=0, mode=PERIODIC, callback=None):
+        self.period = period
+        self.mode = mode
+        self.callback = callback
+
+    def deinit(self):
+        self.callback = None
+
+    def fire(self):
+        """ Runs the callback, like the timer expiring. Returns whether
+            the timer was running.
+        """
+        callback = self.callback
+        if callback is None:
+            return False
+        if self.mode == Timer.ONE_SHOT:
+            self.callback = None
+        callback(self)
+        return True
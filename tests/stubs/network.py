@@ -0,0 +1,73 @@
+"""
+Stand-in for the network module of the esp8266 port: a station interface
+that associates with the strongest matching access point of
+scan_results, associate_ms after connect().
+"""
+import time
+
+import stublog
+
+STA_IF = 0
+AP_IF = 1
+
+# ms from connect() to the association
+associate_ms = 100
+# ssid, bssid, channel, RSSI, security, hidden
+scan_results = [
+    (b'home', b'\x11\x22\x33\x44\x55\x66', 6, -58, 3, 0),
+    (b'home', b'\x11\x22\x33\x44\x55\x77', 11, -71, 3, 0),
+    (b'neighbour', b'\x99\x88\x77\x66\x55\x44', 1, -80, 3, 0),
+]
+hostname = 'esp_010203'
+# what DHCP hands out
+lease = ('192.168.1.50', '255.255.255.0', '192.168.1.1', '192.168.1.1')
+
+
+class WLAN:
+    def __init__(self, interface_id):
+        self._active = False
+        self._ap = None
+        self._since = None
+        self._ifconfig = ('0.0.0.0',) * 4
+        self._static = False
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+
+    def connect(self, ssid=None, password=None, bssid=None):
+        stublog.record('wlan connect', bssid)
+        aps = [ap for ap in scan_results if ap[0] == b'home' and
+               (bssid is None or ap[1] == bssid)]
+        self._ap = max(aps, key=lambda ap: ap[3]) if aps else None
+        self._since = time.perf_counter()
+        if self._ap is not None and not self._static:
+            self._ifconfig = lease
+
+    def disconnect(self):
+        self._ap = None
+
+    def isconnected(self):
+        return (self._ap is not None and
+                (time.perf_counter() - self._since) * 1000 >= associate_ms)
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig
+        stublog.record('wlan ifconfig', config)
+        self._static = config != 'dhcp'
+        if self._static:
+            self._ifconfig = tuple(config)
+
+    def config(self, param):
+        return {
+            'essid': self._ap[0].decode() if self._ap else '',
+            'channel': self._ap[2] if self._ap else 1,
+            'dhcp_hostname': hostname,
+            'mac': b'\x8c\xaa\xb5\x01\x02\x03',
+        }[param]
+
+    def scan(self):
+        stublog.record('wlan scan')
+        return list(scan_results)
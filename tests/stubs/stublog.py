@@ -0,0 +1,11 @@
+"""
+What the stubs were asked to do and when, in ms of time.perf_counter(),
+the clock of the ticks functions.
+"""
+import time
+
+entries = []
+
+
+def record(*entry):
+    entries.append((time.perf_counter() * 1000,) + entry)
@@ -0,0 +1,41 @@
+"""
+Stand-in for umqtt.simple. connect() blocks for connect_ms, like the TCP
+and MQTT handshakes do, and what is sent is recorded.
+"""
+import time
+
+import stublog
+
+# ms the connection takes
+connect_ms = 50
+
+
+class _Socket:
+    def write(self, buf, n=None):
+        stublog.record('mqtt write', bytes(buf if n is None else buf[:n]))
+        return len(buf) if n is None else n
+
+
+class MQTTClient:
+    def __init__(self, client_id, server, port=0, user=None, password=None,
+                 keepalive=0, ssl=False, ssl_params={}):
+        self.client_id = client_id
+        self.server = server
+        self.sock = None
+
+    def set_last_will(self, topic, msg, retain=False, qos=0):
+        pass
+
+    def connect(self, clean_session=True):
+        stublog.record('mqtt connect', self.server)
+        time.sleep(connect_ms / 1000)
+        self.sock = _Socket()
+        stublog.record('mqtt connected')
+        return False
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        stublog.record('mqtt publish', topic, msg, retain)
+
+    def disconnect(self):
+        stublog.record('mqtt disconnect')
+        self.sock = None
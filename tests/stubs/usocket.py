@@ -0,0 +1,14 @@
+"""
+Stand-in for usocket: the sockets of CPython, with every host name
+resolving to localhost, where the tests run stand-in servers.
+"""
+import socket as _socket
+from socket import *  # noqa: F401,F403
+
+# ports of the stand-in servers, by the port the modules use
+ports = {}
+
+
+def getaddrinfo(host, port, *args):
+    return _socket.getaddrinfo('127.0.0.1', ports.get(port, port), AF_INET,
+                               SOCK_DGRAM)
@@ -0,0 +1,2 @@
+# the modules fall back to struct themselves, older revisions do not
+from struct import *  # noqa: F401,F403
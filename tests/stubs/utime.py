@@ -0,0 +1,43 @@
+"""
+Stand-in for the utime module of the esp8266 port: the time counts seconds
+since 2000-01-01, and localtime is UTC, like the RTC.
+"""
+import time as _time
+from time import sleep
+
+# 2000-01-01 in Unix time
+EPOCH = 946684800
+# seconds added to the time, e.g. to skip a deep sleep
+offset = 0
+
+
+def time():
+    return int(_time.time()) - EPOCH + offset
+
+
+def localtime(secs=None):
+    return tuple(_time.gmtime((time() if secs is None else secs) + EPOCH))[:8]
+
+
+def ticks_ms():
+    return int(_time.perf_counter() * 1000)
+
+
+def ticks_us():
+    return int(_time.perf_counter() * 1000000)
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def ticks_diff(ticks1, ticks2):
+    return ticks1 - ticks2
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
@@ -0,0 +1,8 @@
+"""
+Stand-in for webrepl, without a client connected.
+"""
+client_s = None
+
+
+def start(*args, **kwargs):
+    pass
@@ -0,0 +1,134 @@
+"""
+Measures the heap allocations of the read path per call.
+
+On the unix port of MicroPython, gc.mem_alloc() is compared before and
+after with the collector disabled, which counts every allocation. The read
+paths of the int32 engine must not allocate at all, the other engines and
+metrics_from() are only reported, as they build long ints and floats:
+
+    cd tests && micropython test_alloc.py
+
+On CPython, tracemalloc stands in for it. As CPython frees temporaries
+right away and allocates int objects for any larger value, it only shows
+memory retained by the calls. The I2C transfers are checked to go into the
+driver's own buffers on both.
+"""
+import gc
+import sys
+from array import array
+
+if sys.implementation.name == 'micropython':
+    sys.path.append('..')
+    import time
+    time.sleep_ms = time.sleep_us = lambda t: None
+
+import bme280_float
+import bme280_int
+import bme280_int32
+from fakei2c import FakeI2C
+
+N = 100
+ENGINES = (bme280_int, bme280_float, bme280_int32)
+
+
+class StrictI2C(FakeI2C):
+    """ Fails on transfers that return a new buffer, once armed. """
+
+    armed = False
+
+    def readfrom_mem(self, addr, reg, n):
+        assert not self.armed, 'readfrom_mem allocates, reg 0x%02x' % reg
+        return FakeI2C.readfrom_mem(self, addr, reg, n)
+
+    def writeto_mem(self, addr, reg, buf):
+        # without recording the writes, which would be counted
+        self.regs[reg:reg + len(buf)] = buf
+
+
+if sys.implementation.name == 'micropython':
+    def allocated(fn, *args):
+        """ Returns the bytes allocated by a call of fn. """
+        fn(*args)
+        gc.collect()
+        gc.disable()
+        try:
+            before = gc.mem_alloc()
+            for _ in range(N):
+                fn(*args)
+            return (gc.mem_alloc() - before) // N
+        finally:
+            gc.enable()
+else:
+    import tracemalloc
+
+    def allocated(fn, *args):
+        """ Returns the bytes retained by a call of fn. """
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn(*args)
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(N):
+                fn(*args)
+            return (tracemalloc.get_traced_memory()[0] - before) // N
+        finally:
+            tracemalloc.stop()
+
+
+def sensor(module):
+    i2c = StrictI2C()
+    bme = module.BME280(i2c=i2c)
+    i2c.armed = True
+    return bme
+
+
+def check_read_into(module):
+    bme = sensor(module)
+    sample = bme._sample
+    assert bme.read_compensated_data(sample) is sample
+    return allocated(bme.read_compensated_data, sample)
+
+
+def check_start_and_read(module):
+    bme = sensor(module)
+
+    def read(sample):
+        bme.start_measurement()
+        bme.read_compensated_data(sample)
+    return allocated(read, bme._sample)
+
+
+def check_batch(module):
+    bme = sensor(module)
+    out = array(bme._engine.typecode, [0] * 12)
+    return allocated(bme.read_batch, 4, out)
+
+
+def check_metrics(module):
+    bme = sensor(module)
+    sample = bme.read_compensated_data(bme._sample)
+    out = array('f', (0, 0, 0, 0, 0))
+    assert bme.metrics_from(sample, out) is out
+    return allocated(bme.metrics_from, sample, out)
+
+
+READ_CHECKS = (check_read_into, check_start_and_read, check_batch)
+CHECKS = READ_CHECKS + (check_metrics,)
+
+
+def test_read_path_retains_nothing(no_sleep):
+    for module in ENGINES:
+        for check in CHECKS:
+            assert check(module) == 0, (module.__name__, check.__name__)
+
+
+if __name__ == '__main__':
+    failed = []
+    for module in ENGINES:
+        for check in CHECKS:
+            n = check(module)
+            print('{:14} {:22} {:5} bytes/call'.format(
+                module.__name__, check.__name__, n))
+            if module is bme280_int32 and check in READ_CHECKS and n:
+                failed.append(check.__name__)
+    assert not failed, 'bme280_int32 allocates in ' + ', '.join(failed)
@@ -0,0 +1,87 @@
+import math
+
+import pytest
+
+import bme280_float
+import bme280_int
+import bme280_int32
+from fakei2c import FakeI2C
+
+ENGINES = (bme280_int, bme280_float, bme280_int32)
+
+
+@pytest.mark.parametrize('module', ENGINES)
+def test_skipped_pressure_has_no_altitude(module):
+    bme = module.BME280(i2c=FakeI2C(), osrs_p=module.BME280_OSAMPLE_SKIP)
+    assert bme.altitude == 0.0
+
+
+@pytest.mark.parametrize('module', ENGINES)
+def test_skipped_humidity_has_no_dew_point(module):
+    bme = module.BME280(i2c=FakeI2C(), osrs_h=module.BME280_OSAMPLE_SKIP)
+    assert math.isnan(bme.dew_point)
+
+
+@pytest.mark.parametrize('module', ENGINES)
+def test_altitude_and_dew_point(module):
+    bme = module.BME280(i2c=FakeI2C())
+    scale = bme._engine.scale[0]
+    # 1006.5 hPa, 25.08 degC and 53.9 %RH of the fake sensor, at the default
+    # sea level pressure
+    assert bme.altitude == pytest.approx(56.0, abs=0.5)
+    assert bme.dew_point / scale == pytest.approx(15.1, abs=0.1)
+
+
+class NormalModeI2C(FakeI2C):
+    """ A BME280 in normal mode on a virtual clock, whose conversions take
+        the typical time, scaled by drift, followed by the standby time.
+        Records the conversion each burst readout returns.
+    """
+
+    def __init__(self, clock, conversion, standby, drift):
+        super().__init__()
+        self.clock = clock
+        self.conversion = conversion * drift
+        self.period = (conversion + standby) * drift
+        self.start = None
+        self.samples = []
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        self.clock[0] += 50
+        if self.start is not None:
+            # the last conversion that ended, and whether one is running
+            last, phase = divmod(
+                self.clock[0] - self.start - self.conversion, self.period)
+            measuring = phase >= self.period - self.conversion
+            self.regs[0xF3] = 0x08 if measuring else 0
+            if reg == 0xF7:
+                self.samples.append(int(last))
+        super().readfrom_mem_into(addr, reg, buf)
+
+    def writeto_mem(self, addr, reg, buf):
+        super().writeto_mem(addr, reg, buf)
+        if reg == 0xF4:
+            self.start = self.clock[0] if buf[0] & 3 == 3 else None
+
+
+@pytest.mark.parametrize('standby', (0, 1))
+@pytest.mark.parametrize('drift', (0.96, 1.0, 1.04))
+def test_stream_reads_every_conversion(monkeypatch, standby, drift):
+    clock = [0]
+
+    def sleep_us(us):
+        clock[0] += us
+    monkeypatch.setattr(bme280_int.time, 'ticks_us', lambda: clock[0])
+    monkeypatch.setattr(bme280_int.time, 'sleep_us', sleep_us)
+    monkeypatch.setattr(bme280_int.time, 'sleep_ms',
+                        lambda ms: sleep_us(ms * 1000))
+    bme = bme280_int.BME280(i2c=FakeI2C())
+    i2c = NormalModeI2C(clock, bme._typ_us,
+                        (500, 62500)[standby], drift)
+    bme.i2c = i2c
+    samples = bme.stream(standby=standby)
+    for _ in range(100):
+        next(samples)
+    samples.close()
+    assert i2c.samples == list(range(100))
+    assert i2c.regs[0xF4] & 3 == 0
@@ -0,0 +1,30 @@
+import json
+import os
+
+import pytest
+
+import bme280_float
+import bme280_int
+import bme280_int32
+from fakei2c import FakeI2C
+
+# raw readings and reference outputs, see tools/record_vectors.py
+VECTORS = os.path.join(os.path.dirname(__file__), 'bme280_vectors.json')
+with open(VECTORS) as f:
+    CALIBRATIONS = json.load(f)
+
+# engine and the index of its reference output in a vector
+ENGINES = ((bme280_int, 1), (bme280_float, 2), (bme280_int32, 3))
+
+
+@pytest.mark.parametrize('module, ref', ENGINES)
+@pytest.mark.parametrize('cal', range(len(CALIBRATIONS)))
+def test_matches_reference(module, ref, cal, no_sleep):
+    calibration = CALIBRATIONS[cal]
+    i2c = FakeI2C(cal_88=bytes.fromhex(calibration['cal_88']),
+                  cal_e1=bytes.fromhex(calibration['cal_e1']))
+    bme = module.BME280(i2c=i2c)
+    for vector in calibration['vectors']:
+        i2c.set_raw(*vector[0])
+        # bit exact, float outputs are float32 values on both sides
+        assert list(bme.read_compensated_data()) == vector[ref], vector[0]
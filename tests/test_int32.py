@@ -0,0 +1,68 @@
+from array import array
+
+import pytest
+
+import bme280_int
+import bme280_int32
+from fakei2c import FakeI2C
+from test_engines import CALIBRATIONS
+
+# largest difference of the int32 pressure to the 64 bit one, in Pa
+PRESSURE_BOUND = 7
+
+
+def checked(op):
+    def wrapped(a, b):
+        return SmallInt(getattr(int, op)(a, b))
+    return wrapped
+
+
+class SmallInt(int):
+    """ An int that fails once a value leaves the MicroPython small int
+        range, the values that do not allocate on the heap.
+    """
+
+    def __new__(cls, value):
+        assert -(1 << 30) <= value < 1 << 30, value
+        return int.__new__(cls, value)
+
+    def __neg__(self):
+        return SmallInt(-int(self))
+
+
+for _op in ('add', 'sub', 'mul', 'floordiv', 'mod', 'lshift', 'rshift',
+            'and', 'or'):
+    setattr(SmallInt, '__%s__' % _op, checked('__%s__' % _op))
+    setattr(SmallInt, '__r%s__' % _op, checked('__r%s__' % _op))
+
+
+def engines(calibration):
+    i2c = FakeI2C(cal_88=bytes.fromhex(calibration['cal_88']),
+                  cal_e1=bytes.fromhex(calibration['cal_e1']))
+    return (bme280_int32.BME280(i2c=i2c)._engine,
+            bme280_int.BME280(i2c=i2c)._engine)
+
+
+@pytest.mark.parametrize('calibration', CALIBRATIONS)
+def test_stays_within_small_ints(calibration):
+    # a sample allocates nothing if no intermediate value needs a long int
+    engine = engines(calibration)[0]
+    engine._coef = tuple(SmallInt(c) for c in engine._coef)
+    result = array('i', (0, 0, 0))
+    for vector in calibration['vectors']:
+        engine.compensate([SmallInt(v) for v in vector[0]], result, 0)
+        assert list(result) == vector[3]
+
+
+@pytest.mark.parametrize('calibration', CALIBRATIONS)
+def test_close_to_64_bit(calibration):
+    int32, int64 = engines(calibration)
+    result = array('i', (0, 0, 0))
+    reference = array('i', (0, 0, 0))
+    for vector in calibration['vectors']:
+        raw = array('i', vector[0])
+        int32.compensate(raw, result, 0)
+        int64.compensate(raw, reference, 0)
+        assert result[0] == reference[0]
+        assert abs(result[1] - reference[1] / 256) <= PRESSURE_BOUND
+        assert result[2] == reference[2]
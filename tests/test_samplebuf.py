@@ -0,0 +1,49 @@
+import pytest
+
+import machine
+import rtcmem
+import samplebuf
+import samplecodec
+
+RECORD = (657000000, 2150, 10135, 4530, 980)
+
+
+@pytest.fixture
+def buf(tmp_path, monkeypatch):
+    """ An empty sample buffer, in empty RTC memory and flash. """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(machine, '_memory', b'')
+    monkeypatch.setattr(rtcmem, '_slots', None)
+    return samplebuf
+
+
+def flash(data):
+    with open(samplebuf.FLASH_FILE, 'wb') as f:
+        f.write(data)
+
+
+def records(n):
+    return [(RECORD[0] + 600 * i,) + RECORD[1:] for i in range(n)]
+
+
+def test_records_and_count(buf):
+    for record in records(100):
+        buf.append(*record)
+    assert list(buf.records()) == records(100)
+    assert buf.count() == 100
+
+
+def test_unwalkable_flash_keeps_the_new_block(buf):
+    flash(bytes(samplebuf.FLASH_SIZE))
+    block = samplecodec.encode(RECORD)
+    buf._to_flash(block)
+    assert list(buf.records()) == [RECORD]
+
+
+def test_count_skips_corrupt_blocks(buf):
+    first, second = records(2)
+    corrupt = bytearray(samplecodec.encode(first))
+    corrupt[-1] ^= 1
+    flash(bytes(corrupt) + samplecodec.encode(second))
+    buf.append(*RECORD)
+    assert buf.count() == len(list(buf.records())) == 1
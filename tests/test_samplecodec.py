@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+import samplecodec
+
+RECORD = (657000000, 2150, 10135, 4530, 980)
+
+
+def walk(rng, n, record=RECORD):
+    """ Returns n records, each within 16 bit deltas of the one before. """
+    records = [record]
+    for _ in range(n - 1):
+        t, temp, press, hum, adc = records[-1]
+        records.append((t + rng.randrange(0x10000),
+                        temp + rng.randrange(-0x8000, 0x8000),
+                        (press + rng.randrange(-300, 300)) & 0xffff,
+                        (hum + rng.randrange(-500, 500)) & 0xffff,
+                        (adc + rng.randrange(-20, 20)) & 0xffff))
+    return records
+
+
+def encode(records):
+    block = None
+    for record in records:
+        block = samplecodec.encode(record, block)
+        assert block is not None
+    return block
+
+
+def test_round_trip():
+    rng = random.Random(18)
+    for n in (1, 2, 10, 255):
+        records = walk(rng, n)
+        block = encode(records)
+        assert len(block) == samplecodec.size(n)
+        assert list(samplecodec.decode(block)) == records
+
+
+def test_concatenated_blocks():
+    rng = random.Random(18)
+    parts = [walk(rng, n) for n in (3, 1, 7)]
+    blocks = [encode(records) for records in parts]
+    data = b''.join(blocks)
+    assert list(samplecodec.decode(data)) == sum(parts, [])
+    assert samplecodec.blocks(data) == [0, len(blocks[0]),
+                                        len(blocks[0]) + len(blocks[1])]
+
+
+@pytest.mark.parametrize('record', [
+    (RECORD[0] - 1,) + RECORD[1:],
+    (RECORD[0] + 0x10000,) + RECORD[1:],
+    (RECORD[0], RECORD[1] + 0x8000) + RECORD[2:],
+    (RECORD[0], RECORD[1] - 0x8001) + RECORD[2:],
+])
+def test_rejects_wide_deltas(record):
+    assert samplecodec.encode(record, samplecodec.encode(RECORD)) is None
+
+
+def test_rejects_full_block():
+    block = encode(walk(random.Random(18), 255))
+    assert samplecodec.encode(RECORD, block) is None
+
+
+def test_every_byte_change_is_detected():
+    block = encode(walk(random.Random(18), 5))
+    for i in range(len(block)):
+        for value in (block[i] ^ 1, block[i] ^ 0x80, 0, 0xff):
+            if value == block[i]:
+                continue
+            corrupt = bytearray(block)
+            corrupt[i] = value
+            with pytest.raises(ValueError):
+                list(samplecodec.decode(corrupt))
+
+
+def test_truncation_is_detected():
+    block = encode(walk(random.Random(18), 5))
+    for end in range(1, len(block)):
+        with pytest.raises(ValueError):
+            list(samplecodec.decode(block[:end]))
+
+
+def test_fuzz():
+    # whatever the input, decode yields records or raises ValueError
+    rng = random.Random(18)
+    valid = b''.join(encode(walk(rng, rng.randrange(1, 20)))
+                     for _ in range(5))
+    for _ in range(5000):
+        if rng.random() < 0.5:
+            data = bytes(rng.randrange(256)
+                         for _ in range(rng.randrange(64)))
+        else:
+            data = bytearray(valid)
+            for _ in range(rng.randrange(1, 4)):
+                data[rng.randrange(len(data))] = rng.randrange(256)
+            data = data[rng.randrange(len(data)):][:rng.randrange(400)]
+        try:
+            for record in samplecodec.decode(data):
+                assert len(record) == 5
+        except ValueError:
+            pass
+        samplecodec.blocks(data)
@@ -0,0 +1,23 @@
+import scheduler
+
+STABLE = (600, 0, 0, 3.9)
+FAST = (600, 100, 0, 3.9)
+
+
+def test_grows_while_stable():
+    assert scheduler.policy(600, *STABLE) == 900
+    assert scheduler.policy(1500, *STABLE) == scheduler.MAX_SLEEP
+
+
+def test_halves_on_fast_changes():
+    assert scheduler.policy(600, *FAST) == 300
+    assert scheduler.policy(200, *FAST) == scheduler.MIN_SLEEP
+
+
+def test_low_battery_stays_within_deepsleep():
+    interval = scheduler.DEFAULT_SLEEP
+    for _ in range(10):
+        interval = scheduler.policy(interval, 600, 0, 0, 3.3)
+    assert interval == scheduler.DEEPSLEEP_LIMIT
+    # esp.deepsleep takes a signed 32 bit us value
+    assert interval * 1000000 <= 2 ** 31 - 1
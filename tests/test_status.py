@@ -0,0 +1,74 @@
+import importlib
+
+import pytest
+
+import status as _status
+
+
+@pytest.fixture
+def status(monkeypatch):
+    module = importlib.reload(_status)
+    module.mode = module.BLINK
+    # sleeping runs the timer, like on the device
+    monkeypatch.setattr(module.utime, 'sleep_ms', lambda ms: [
+        module._timer.fire() for _ in range(ms // module.STEP_MS)])
+    return module
+
+
+def led(status):
+    # active low
+    return '.' if status._led.value() else 'x'
+
+
+def run(status):
+    """ Returns the LED states of every step until the timer stops. """
+    states = led(status)
+    while status._timer.fire():
+        states += led(status)
+    return states
+
+
+def test_blink_patterns_are_queued(status):
+    status.phase('boot', 1)
+    status.phase('wake', 2)
+    status.phase('sensors')
+    assert run(status) == 'x......' + 'x..x.......'
+
+
+def test_finish_waits_for_the_blinks(status):
+    status.phase('boot', 1)
+    states = led(status)
+    status._timer.fire()
+    status.phase('published', 4)
+    states += led(status)
+
+    # record the LED on every step finish() waits for
+    fire = status._timer.fire
+
+    def record():
+        nonlocal states
+        running = fire()
+        states += led(status)
+        return running
+    status._timer.fire = record
+    status.finish()
+    assert states.startswith('x......x..x..x..x')
+    assert set(states[17:]) <= {'.'}
+    assert led(status) == '.'
+    assert not status._queue
+
+
+def test_pulse_replaces_the_running_one(status):
+    status.mode = status.PULSE
+    status.phase('boot', 1)
+    status.phase('wake', 2)
+    assert run(status) == 'x.'
+    status.finish()
+
+
+def test_off_mode_leaves_the_led_alone(status):
+    status.mode = status.OFF
+    status.phase('boot', 1)
+    status.finish()
+    assert status._led is None
+    assert [name for name, ms in status.timings()] == ['boot']
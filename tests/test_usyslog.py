@@ -0,0 +1,121 @@
+import re
+import socket
+
+import pytest
+
+import usyslog
+
+
+@pytest.fixture
+def server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    yield sock
+    sock.close()
+
+
+def received(sock, timeout=0.2):
+    """ Returns the datagrams that arrive until nothing came for timeout. """
+    sock.settimeout(timeout)
+    datagrams = []
+    try:
+        while True:
+            datagrams.append(sock.recv(2048))
+    except socket.timeout:
+        return datagrams
+
+
+def client(server, cls=usyslog.BufferedUDPClient, **kwargs):
+    return cls('127.0.0.1', server.getsockname()[1], **kwargs)
+
+
+def test_one_datagram_per_message(server):
+    log = client(server, usyslog.UDPClient)
+    log.info('temperature: %s', 21.5)
+    log.error('no sensor')
+    assert received(server) == [b'<14>temperature: 21.5', b'<11>no sensor']
+
+
+def test_level_and_lazy_formatting(server):
+    class Unprintable:
+        def __str__(self):
+            raise AssertionError('formatted a dropped message')
+
+    log = client(server, level=usyslog.S_INFO)
+    log.debug('%s', Unprintable())
+    log.info('kept')
+    log.flush()
+    assert received(server) == [b'<14>kept']
+
+
+def test_queued_until_flush(server):
+    log = client(server)
+    for i in range(3):
+        log.info('message %d', i)
+    assert received(server, 0.05) == []
+    log.flush()
+    assert received(server) == [b'<14>message 0', b'<14>message 1',
+                                b'<14>message 2']
+    log.flush()
+    assert received(server, 0.05) == []
+
+
+def test_coalesce(server):
+    log = client(server, coalesce=True)
+    log.info('one')
+    log.warning('two')
+    log.flush()
+    assert received(server) == [b'<14>one\n<12>two\n']
+
+
+def test_drops_debug_first(server):
+    # room for three INFO messages of 11 bytes with their newline
+    log = client(server, size=33)
+    log.info('info 0')
+    log.debug('dbg 1')
+    log.info('info 2')
+    log.info('info 3')
+    log.debug('dbg 4')
+    log.flush()
+    assert received(server) == [b'<12>2 log messages dropped',
+                                b'<14>info 0', b'<14>info 2',
+                                b'<14>info 3']
+
+
+def test_drops_oldest_without_debug(server):
+    log = client(server, count=2)
+    for i in range(4):
+        log.info('message %d', i)
+    log.flush()
+    assert received(server) == [b'<12>2 log messages dropped',
+                                b'<14>message 2', b'<14>message 3']
+
+
+def test_cuts_long_messages(server):
+    log = client(server, size=16)
+    log.info('0123456789abcdef')
+    log.flush()
+    assert received(server) == [b'<14>0123456789a']
+
+
+def test_header_longer_than_buffer(server):
+    formatter = usyslog.RFC5424Formatter('node', 'app', 'wake')
+    log = client(server, formatter=formatter, size=30)
+    log.info('does not fit')
+    log.info('neither')
+    log.flush()
+    [report] = received(server)
+    assert report.startswith(b'<12>1 ')
+    assert report.endswith(b' node app - wake - 2 log messages dropped')
+
+
+def test_rfc5424(server):
+    formatter = usyslog.RFC5424Formatter(
+        'node', 'app', 'wake', {'origin': {'software': 'a"b]'}})
+    log = client(server, formatter=formatter)
+    log.info('hello')
+    log.flush()
+    [datagram] = received(server)
+    assert re.fullmatch(
+        rb'<14>1 \d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ node app - wake '
+        rb'\[origin software="a\\"b\\]"\] hello', datagram), datagram
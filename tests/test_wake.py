@@ -0,0 +1,112 @@
+import pytest
+
+import hostwake
+import machine
+import network
+import scheduler
+
+DEEPSLEEP_WAKE = 'esp.deepsleep(1000, 0)'
+# main.LEASE_RENEW, importing main runs a wake
+LEASE_RENEW = 12 * 3600
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch):
+    """ A node without RTC memory and flash files, after a power on. """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(machine, '_memory', b'')
+    monkeypatch.setattr(machine, 'adc', 980)
+    monkeypatch.setattr(network, 'scan_results', network.scan_results[:])
+    monkeypatch.setattr(hostwake.utime, 'offset', 0)
+    ntp = hostwake.NTPServer()
+    yield
+    ntp.close()
+
+
+def radio_wake():
+    """ Boots after a deep sleep with the radio enabled and something to
+        report, as the battery voltage changed.
+    """
+    import rtcmem
+    rtcmem.remove(rtcmem.T_RADIO)
+    rtcmem.save()
+    machine.adc -= 20
+    hostwake.sleep(600)
+    return hostwake.boot()
+
+
+def test_ntp_request_before_mqtt_connect(node):
+    assert hostwake.boot(machine.PWRON_RESET) is None
+    [request] = hostwake.events('ntp request')
+    [connect] = hostwake.events('mqtt connect')
+    assert request[0] < connect[0]
+    assert hostwake.events('rtc')
+
+
+def test_quiet_wake_keeps_radio_off(node):
+    hostwake.boot(machine.PWRON_RESET)
+    hostwake.sleep(600)
+    assert hostwake.boot().endswith(', 4)')
+    assert not hostwake.events('wlan connect')
+    assert not hostwake.events('mqtt connect')
+
+
+def test_restart_for_the_radio_reports(node):
+    hostwake.boot(machine.PWRON_RESET)
+    hostwake.sleep(600)
+    machine.adc -= 20
+    assert hostwake.boot() == DEEPSLEEP_WAKE
+    assert not hostwake.events('wlan connect')
+    # the battery recovers before the restarted wake reads it
+    machine.adc += 20
+    assert hostwake.boot().startswith('esp.deepsleep(')
+    [written] = [e[2] for e in hostwake.events('mqtt write')
+                 if b'/voltage' in e[2]]
+    assert b'/temperature' not in written
+
+
+def test_fast_connect(node):
+    hostwake.boot(machine.PWRON_RESET)
+    assert radio_wake().startswith('esp.deepsleep(')
+    [connect] = hostwake.events('wlan connect')
+    assert connect[2] == network.scan_results[0][1]
+    assert not hostwake.events('wlan scan')
+
+
+def test_lease_renewed_after_lease_renew(node):
+    hostwake.boot(machine.PWRON_RESET)
+    hostwake.sleep(LEASE_RENEW - 1200)
+    radio_wake()
+    assert hostwake.events('wlan connect')[0][2] is not None
+    radio_wake()
+    [connect] = hostwake.events('wlan connect')
+    assert connect[2] is None
+    # the renewed lease is reused again
+    radio_wake()
+    assert hostwake.events('wlan connect')[0][2] is not None
+
+
+def test_failed_fast_connect_restarts_through_deep_sleep(node):
+    hostwake.boot(machine.PWRON_RESET)
+    # the cached access point is gone
+    del network.scan_results[0]
+    assert radio_wake() == DEEPSLEEP_WAKE
+    assert not hostwake.events('reset')
+    import rtcmem
+    assert rtcmem.get(rtcmem.T_WIFI) is None
+    # the next wake does the full scan and DHCP
+    machine.adc -= 20
+    assert hostwake.boot().startswith('esp.deepsleep(')
+    [connect] = hostwake.events('wlan connect')
+    assert connect[2] is None
+
+
+def test_low_battery_sleep_stays_within_deepsleep(node):
+    machine.adc = 700
+    hostwake.boot(machine.PWRON_RESET)
+    for _ in range(8):
+        ended = hostwake.boot()
+        assert ended.startswith('esp.deepsleep(')
+        [sleep] = hostwake.events('deepsleep')
+        hostwake.sleep(sleep[2] // 1000000)
+    assert sleep[2] == scheduler.DEEPSLEEP_LIMIT * 1000000
@@ -0,0 +1,147 @@
+"""
+Keeps the RTC in sync with NTP, but only queries the server when the
+predicted RTC error gets too large.
+
+The RTC keeps running through deep sleep, but drifts. On each sync, the
+offset between the RTC and NTP time is turned into a drift rate, which is
+kept in the RTC memory together with the time of the sync. A wake only
+syncs if the drift times the time since the last sync exceeds MAX_ERROR,
+or after MAX_AGE.
+
+sync_async() does the same in a uasyncio task, and yields while waiting for
+the reply, so that e.g. the MQTT connection can be set up meanwhile.
+"""
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import machine
+try:
+    import usocket
+    from ustruct import pack, unpack
+except ImportError:
+    import socket as usocket
+    from struct import pack, unpack
+import utime
+import dnscache
+import rtcmem
+
+NTP_HOST = 'pool.ntp.org'
+# seconds to wait for the NTP reply
+TIMEOUT = 1
+# seconds of predicted RTC error that trigger a sync
+MAX_ERROR = 2
+# seconds after which to sync anyway
+MAX_AGE = const(86400)
+# drift in ppm assumed until one was measured
+DEFAULT_DRIFT = const(20000)
+# seconds between two syncs needed to measure the drift
+MIN_INTERVAL = const(600)
+
+# seconds between the NTP epoch (1900) and the MicroPython one (2000)
+_NTP_DELTA = const(3155673600)
+
+
+def _request():
+    """ Sends an NTP query, returns the socket to receive the reply on. """
+    query = bytearray(48)
+    query[0] = 0x1B
+    addr = usocket.getaddrinfo(dnscache.resolve(NTP_HOST), 123)[0][-1]
+    s = usocket.socket(usocket.AF_INET, usocket.SOCK_DGRAM)
+    try:
+        s.sendto(query, addr)
+    except OSError:
+        s.close()
+        dnscache.invalidate(NTP_HOST)
+        raise
+    return s
+
+
+def _time(msg):
+    return unpack('!I', msg[40:44])[0] - _NTP_DELTA
+
+
+def ntp_time():
+    """ Queries the NTP server, returns the seconds since 2000. """
+    s = _request()
+    try:
+        s.settimeout(TIMEOUT)
+        msg = s.recv(48)
+    except OSError:
+        dnscache.invalidate(NTP_HOST)
+        raise
+    finally:
+        s.close()
+    return _time(msg)
+
+
+async def ntp_time_async():
+    """ Like ntp_time(), but yields while waiting for the reply. """
+    s = _request()
+    try:
+        s.setblocking(False)
+        start = utime.ticks_ms()
+        while True:
+            try:
+                return _time(s.recv(48))
+            except OSError:
+                if utime.ticks_diff(utime.ticks_ms(), start) > TIMEOUT * 1000:
+                    dnscache.invalidate(NTP_HOST)
+                    raise
+            await asyncio.sleep(0.01)
+    finally:
+        s.close()
+
+
+def predicted_error():
+    """ Returns the predicted RTC error in seconds, or None if the RTC was
+        never synced.
+    """
+    mem = rtcmem.get(rtcmem.T_NTP)
+    if mem is None:
+        return None
+    last, drift = unpack('<Ii', mem)
+    elapsed = utime.time() - last
+    if not 0 <= elapsed <= MAX_AGE:
+        return None
+    return elapsed * abs(drift) / 1000000
+
+
+def _due(force):
+    error = predicted_error()
+    return force or error is None or error > MAX_ERROR
+
+
+def _set(t):
+    now = utime.time()
+    drift = DEFAULT_DRIFT
+    mem = rtcmem.get(rtcmem.T_NTP)
+    if mem is not None:
+        last, drift = unpack('<Ii', mem)
+        if now - last >= MIN_INTERVAL:
+            drift = (t - now) * 1000000 // (now - last)
+
+    tm = utime.localtime(t)
+    machine.RTC().datetime((tm[0], tm[1], tm[2], tm[6] + 1,
+                            tm[3], tm[4], tm[5], 0))
+    rtcmem.put(rtcmem.T_NTP, pack('<Ii', t, drift))
+
+
+def sync(force=False):
+    """ Sets the RTC from NTP if the predicted error is too large.
+
+        Returns:
+            True if the RTC was set
+    """
+    if not _due(force):
+        return False
+    _set(ntp_time())
+    return True
+
+
+async def sync_async(force=False):
+    """ Like sync(), but yields while waiting for the NTP reply. """
+    if not _due(force):
+        return False
+    _set(await ntp_time_async())
+    return True
@@ -0,0 +1,78 @@
+"""
+Measures the per sample cost of BME280 drivers against a fake I2C bus, on
+CPython.
+
+    python3 tools/bench_compensation.py [driver ...]
+
+A driver is a module name (default: one per compensation engine,
+bme280_int, bme280_float and bme280_int32) or the path of a driver file,
+e.g. an older version for a before and after comparison:
+
+    git show <rev>:bme280_int.py > /tmp/bme280_int_old.py
+    python3 tools/bench_compensation.py bme280_int /tmp/bme280_int_old.py
+
+The sleeps waiting for the conversion are patched out, so the numbers are
+the CPU time of a forced mode read, I2C transfers and compensation, and of
+the compensation alone where the driver has a separate one.
+"""
+import importlib
+import importlib.util
+import os
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'tests'))
+import host  # noqa: E402
+
+host.install()
+from fakei2c import FakeI2C  # noqa: E402
+
+N = 20000
+ENGINES = ('bme280_int', 'bme280_float', 'bme280_int32')
+
+
+def load(driver):
+    if driver.endswith('.py'):
+        name = os.path.splitext(os.path.basename(driver))[0]
+        spec = importlib.util.spec_from_file_location(name, driver)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    return importlib.import_module(driver)
+
+
+def per_sample(fn, *args):
+    start = time.perf_counter()
+    for _ in range(N):
+        fn(*args)
+    return (time.perf_counter() - start) / N * 1000000
+
+
+def bench(driver):
+    sensor = load(driver).BME280(i2c=FakeI2C())
+    engine = getattr(sensor, '_engine', None)
+    result = array(engine.typecode if engine else 'i', (0, 0, 0))
+    read = per_sample(sensor.read_compensated_data, result)
+    line = '{:40} read {:7.2f} us/sample'.format(driver, read)
+    compensate = getattr(sensor, '_compensate', None)
+    if compensate is not None:
+        raw = array('i', (519888, 415148, 30000))
+        line += ', compensate {:7.2f} us/sample'.format(
+            per_sample(compensate, raw, result, 0))
+    print(line)
+
+
+def main():
+    sleep_ms, sleep_us = time.sleep_ms, time.sleep_us
+    time.sleep_ms = time.sleep_us = lambda t: None
+    try:
+        for driver in sys.argv[1:] or ENGINES:
+            bench(driver)
+    finally:
+        time.sleep_ms, time.sleep_us = sleep_ms, sleep_us
+
+
+if __name__ == '__main__':
+    main()
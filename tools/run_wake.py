@@ -0,0 +1,70 @@
+"""
+Runs the wake cycle of main.py on CPython against the stubbed network,
+machine, esp and umqtt modules, and prints when each step happened, to
+measure the critical path of a wake on Linux.
+
+    python3 tools/run_wake.py [--wakes N] [--associate-ms MS] [--ntp-ms MS]
+                              [--mqtt-ms MS] [--verbose]
+
+The first wake follows a power on, the others a deep sleep each, or
+600 s when main.py did not go to sleep. The
+BME280 conversion takes the time the driver predicts, the Wi-Fi
+association, the NTP reply and the MQTT connection the given times. The
+files main.py writes to flash go to a temporary directory.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'tests'))
+import hostwake  # noqa: E402
+import machine  # noqa: E402
+import network  # noqa: E402
+import stublog  # noqa: E402
+from umqtt import simple  # noqa: E402
+
+
+def show(wake, cause, ended):
+    entries = stublog.entries
+    start = entries[0][0]
+    print('wake {} after reset cause {}: {}, awake {:.1f} ms'.format(
+        wake, cause, ended or 'stayed awake', entries[-1][0] - start))
+    for entry in entries:
+        if entry[1] not in ('mqtt write', 'mqtt publish', 'pin'):
+            print('  {:8.1f} ms  {}'.format(
+                entry[0] - start, ' '.join(str(x) for x in entry[1:])))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--wakes', type=int, default=3)
+    parser.add_argument('--associate-ms', type=int, default=300)
+    parser.add_argument('--ntp-ms', type=int, default=80)
+    parser.add_argument('--mqtt-ms', type=int, default=120)
+    parser.add_argument('--verbose', action='store_true',
+                        help='show the output of main.py')
+    args = parser.parse_args()
+    network.associate_ms = args.associate_ms
+    simple.connect_ms = args.mqtt_ms
+
+    ntp = hostwake.NTPServer(args.ntp_ms)
+    with tempfile.TemporaryDirectory() as flash:
+        os.chdir(flash)
+        cause = machine.PWRON_RESET
+        for wake in range(args.wakes):
+            out = sys.stdout if args.verbose else io.StringIO()
+            with contextlib.redirect_stdout(out):
+                ended = hostwake.boot(cause)
+            show(wake, cause, ended)
+            slept = hostwake.events('deepsleep')
+            hostwake.sleep(slept[0][2] // 1000000 if slept else 600)
+            cause = machine.DEEPSLEEP_RESET
+    ntp.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Replays a trace of readings through deep sleep policies, on CPython, and
+reports the number of wakes, the estimated charge drawn and how far the
+last reading lagged behind the trace for each.
+
+    python3 tools/sleep_sim.py [trace.csv]
+
+A trace is a CSV file of the time in s, the temperature in degC, the
+pressure in hPa and the battery voltage, one reading per line, e.g.
+logged by a node that woke every minute. Lines that do not start with a
+number, like a header, are skipped. Without a trace, a synthetic two day
+one is used: a daily temperature swing, a passing front, and a battery
+that drops below scheduler.LOW_BATTERY on the second day.
+
+A wake reads the trace at the wake time, like the node reads the sensor,
+and the policy picks the next interval from it the way scheduler.update
+does. The charge is the awake time of the wakes at AWAKE_MA plus the rest
+at SLEEP_MA.
+"""
+import bisect
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'tests'))
+import host  # noqa: E402
+
+host.install()
+import scheduler  # noqa: E402
+
+# mean current and time awake per wake, and the deep sleep current
+AWAKE_MA = 70.0
+AWAKE_S = 1.5
+SLEEP_MA = 0.02
+
+
+def fixed(seconds):
+    def policy(interval, dt, dtemp, dpress, volts):
+        return seconds
+    return policy
+
+
+POLICIES = (
+    ('fixed {}s'.format(scheduler.DEFAULT_SLEEP),
+     fixed(scheduler.DEFAULT_SLEEP)),
+    ('fixed {}s'.format(scheduler.MAX_SLEEP), fixed(scheduler.MAX_SLEEP)),
+    ('scheduler.policy', scheduler.policy),
+)
+
+
+def load(path):
+    trace = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split(',')
+            if len(fields) < 4:
+                continue
+            try:
+                trace.append(tuple(float(x) for x in fields[:4]))
+            except ValueError:
+                continue
+    trace.sort()
+    return trace
+
+
+def synthetic(days=2, step=60):
+    rng = random.Random(19)
+    trace = []
+    for t in range(0, days * 86400, step):
+        # cold front after a day and a half
+        front = 1 / (1 + math.exp(-(t - 129600) / 3600))
+        temp = 15 + 6 * math.sin(2 * math.pi * (t / 86400 - 0.3)) - 5 * front
+        press = 1018 - 14 * front + 0.5 * math.sin(2 * math.pi * t / 43200)
+        volts = 3.8 - 0.6 * t / (days * 86400)
+        trace.append((t, temp + rng.gauss(0, 0.02),
+                      press + rng.gauss(0, 0.05), volts))
+    return trace
+
+
+def at(trace, times, t):
+    """ Returns the last reading of the trace at or before t. """
+    return trace[max(0, bisect.bisect_right(times, t) - 1)]
+
+
+def simulate(trace, policy):
+    """ Returns the readings taken when following policy through trace. """
+    times = [r[0] for r in trace]
+    t, end = times[0], times[-1]
+    interval = scheduler.DEFAULT_SLEEP
+    wakes = []
+    while t <= end:
+        _, temp, press, volts = at(trace, times, t)
+        # in the units of scheduler.update: 0.01 degC and 0.1 hPa
+        temp, press = round(temp * 100), round(press * 10)
+        if wakes:
+            last, last_temp, last_press = wakes[-1][:3]
+            interval = policy(interval, t - last, temp - last_temp,
+                              press - last_press, volts)
+        wakes.append((t, temp, press, interval))
+        t += interval
+    return wakes
+
+
+def report(name, trace, wakes):
+    wake_times = [w[0] for w in wakes]
+    temp_lag = press_lag = 0
+    for t, temp, press, _ in trace:
+        w = at(wakes, wake_times, t)
+        temp_lag = max(temp_lag, abs(temp - w[1] / 100))
+        press_lag = max(press_lag, abs(press - w[2] / 10))
+    duration = trace[-1][0] - trace[0][0]
+    awake = len(wakes) * AWAKE_S
+    mah = (awake * AWAKE_MA + (duration - awake) * SLEEP_MA) / 3600
+    print('{:20} {:6} {:9.1f} {:8.1f} {:10.2f} {:10.2f}'.format(
+        name, len(wakes), mah, mah * 86400 / duration, temp_lag, press_lag))
+
+
+def main():
+    trace = load(sys.argv[1]) if len(sys.argv) > 1 else synthetic()
+    if len(trace) < 2:
+        sys.exit('the trace needs at least two readings')
+    print('{:20} {:>6} {:>9} {:>8} {:>10} {:>10}'.format(
+        'policy', 'wakes', 'mAh', 'mAh/day', 'max dT C', 'max dP hPa'))
+    for name, policy in POLICIES:
+        report(name, trace, simulate(trace, policy))
+
+
+if __name__ == '__main__':
+    main()
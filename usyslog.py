@@ -1,11 +1,27 @@
 """
 This syslog client can send UDP packets to a remote syslog server.
 
-Timestamps are not supported for simplicity.
+By default, messages are formatted as <PRI>MSG, without timestamp. Pass
+an RFC5424Formatter to the clients for timestamps from the RTC, the
+hostname, msgid and structured data.
 
-For more information, see RFC 3164.
+Every client has a severity threshold, messages less severe are dropped.
+The severity methods take printf style arguments, which are only formatted
+for messages that pass the threshold:
+
+    log.info('temperature: %s', temp)
+
+BufferedUDPClient queues the messages and sends them on flush(), e.g.
+right before going to deep sleep.
+
+For more information, see RFC 3164 and RFC 5424.
 """
-import usocket
+try:
+    import usocket
+except ImportError:
+    import socket as usocket
+import utime
+from array import array
 
 # Facility constants
 F_KERN = const(0)
@@ -43,44 +59,237 @@ S_NOTICE = const(5)
 S_INFO = const(6)
 S_DEBUG = const(7)
 
-class SyslogClient:
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        ']', '\\]')
+
+
+class Formatter:
+    """ Formats messages as <PRI>MSG. """
     def __init__(self, facility=F_USER):
+        self._prefixes = [('<%d>' % (s + (facility << 3))).encode()
+                          for s in range(8)]
+
+    def parts(self, severity):
+        """ Returns the header of a message, as a tuple of bytes. """
+        return (self._prefixes[severity],)
+
+    def format(self, severity, msg):
+        """ Returns the message with its header, as bytes. """
+        if isinstance(msg, str):
+            msg = msg.encode()
+        return b''.join(self.parts(severity)) + msg
+
+
+class RFC5424Formatter(Formatter):
+    """ Formats messages as described in RFC 5424:
+
+        <PRI>1 TIMESTAMP HOSTNAME APP-NAME PROCID MSGID STRUCTURED-DATA MSG
+
+        The timestamp is the RTC time in UTC, with second resolution, and
+        left out while the RTC is not set. The other fields are built once,
+        the timestamp once per second.
+    """
+    def __init__(self, hostname='-', app_name='-', msgid='-', sd=None,
+                 facility=F_USER):
+        """
+            Args:
+                sd: structured data, dict of SD-IDs to dicts of parameters
+        """
+        super().__init__(facility)
+        self._prefixes = [p + b'1 ' for p in self._prefixes]
+        elements = '-'
+        if sd:
+            elements = ''.join(
+                '[%s%s]' % (sd_id, ''.join(' %s="%s"' % (k, _escape(v))
+                                           for k, v in params.items()))
+                for sd_id, params in sd.items())
+        self._header = (' %s %s - %s %s ' % (
+            hostname or '-', app_name, msgid, elements)).encode()
+        self._time = None
+        self._timestamp = b'-'
+
+    def _now(self):
+        t = utime.time()
+        if t != self._time:
+            self._time = t
+            tm = utime.localtime(t)
+            # the RTC starts at 2000 until it is set
+            self._timestamp = b'-' if tm[0] < 2020 else (
+                '%04d-%02d-%02dT%02d:%02d:%02dZ' % tuple(tm[:6])).encode()
+        return self._timestamp
+
+    def parts(self, severity):
+        return (self._prefixes[severity], self._now(), self._header)
+
+
+class SyslogClient:
+    def __init__(self, facility=F_USER, level=S_DEBUG, formatter=None):
         self._facility = facility
+        # least severe severity to log
+        self.level = level
+        self.formatter = formatter or Formatter(facility)
+
+    def admits(self, severity):
+        return severity <= self.level
 
     def log(self, severity, msg):
         pass
 
-    def alert(self, msg):
-        self.log(S_ALERT, msg)
+    def flush(self):
+        pass
+
+    def _log(self, severity, msg, args):
+        if self.admits(severity):
+            self.log(severity, msg % args if args else msg)
 
-    def critical(self, msg):
-        self.log(S_CRIT, msg)
+    def alert(self, msg, *args):
+        self._log(S_ALERT, msg, args)
 
-    def error(self, msg):
-        self.log(S_ERR, msg)
+    def critical(self, msg, *args):
+        self._log(S_CRIT, msg, args)
 
-    def debug(self, msg):
-        self.log(S_DEBUG, msg)
+    def error(self, msg, *args):
+        self._log(S_ERR, msg, args)
 
-    def info(self, msg):
-        self.log(S_INFO, msg)
+    def debug(self, msg, *args):
+        self._log(S_DEBUG, msg, args)
 
-    def notice(self, msg):
-        self.log(S_NOTICE, msg)
+    def info(self, msg, *args):
+        self._log(S_INFO, msg, args)
 
-    def warning(self, msg):
-        self.log(S_WARN, msg)
+    def notice(self, msg, *args):
+        self._log(S_NOTICE, msg, args)
+
+    def warning(self, msg, *args):
+        self._log(S_WARN, msg, args)
 
 class UDPClient(SyslogClient):
-    def __init__(self, ip='127.0.0.1', port=514, facility=F_USER):
+    def __init__(self, ip='127.0.0.1', port=514, facility=F_USER,
+                 level=S_DEBUG, formatter=None):
         self._addr = usocket.getaddrinfo(ip, port)[0][4]
         self._sock = usocket.socket(usocket.AF_INET, usocket.SOCK_DGRAM)
-        super().__init__(facility)
+        super().__init__(facility, level, formatter)
 
     def log(self, severity, msg):
-        data = "<%d>%s" % (severity + (self._facility << 3), msg)
-        self._sock.sendto(data.encode(), self._addr)
+        self._sock.sendto(self.formatter.format(severity, msg), self._addr)
         
     def close(self):
         self._sock.close()
 
+
+class BufferedUDPClient(UDPClient):
+    """ Queues the messages in a preallocated buffer and sends them on
+        flush(), one datagram per message, or with coalesce all of them in
+        one datagram, separated by newlines, for servers that split them.
+
+        When the buffer is full, queued DEBUG messages are dropped first,
+        then the oldest ones. Messages longer than the buffer are cut,
+        ones whose header alone does not fit are dropped. The number of
+        dropped messages is reported with the next flush.
+    """
+    def __init__(self, ip='127.0.0.1', port=514, facility=F_USER,
+                 level=S_DEBUG, formatter=None, size=1024, count=32,
+                 coalesce=False):
+        """
+            Args:
+                size: buffer size in bytes, keep it below the MTU with
+                    coalesce
+                count: maximum number of queued messages
+                coalesce: send all messages in one datagram
+        """
+        super().__init__(ip, port, facility, level, formatter)
+        self._buf = bytearray(size)
+        # end of each message in _buf, including its newline
+        self._ends = array('H', [0] * count)
+        self._severities = bytearray(count)
+        self._n = 0
+        self._coalesce = coalesce
+        self.dropped = 0
+
+    def _used(self):
+        return self._ends[self._n - 1] if self._n else 0
+
+    def _drop(self, severity=None):
+        """ Drops the first queued message of the severity, or the first
+            one. Returns whether a message was dropped.
+        """
+        for k in range(self._n):
+            if severity is None or self._severities[k] == severity:
+                break
+        else:
+            return False
+        start = self._ends[k - 1] if k else 0
+        size = self._ends[k] - start
+        used = self._used()
+        self._buf[start:used - size] = self._buf[start + size:used]
+        for j in range(k, self._n - 1):
+            self._ends[j] = self._ends[j + 1] - size
+            self._severities[j] = self._severities[j + 1]
+        self._n -= 1
+        self.dropped += 1
+        return True
+
+    def log(self, severity, msg):
+        parts = self.formatter.parts(severity)
+        if isinstance(msg, str):
+            msg = msg.encode()
+        size = len(msg) + 1
+        for part in parts:
+            size += len(part)
+        if size > len(self._buf):
+            cut = size - len(self._buf)
+            if cut > len(msg):
+                # not even the header fits
+                self.dropped += 1
+                return
+            msg = msg[:len(msg) - cut]
+            size = len(self._buf)
+        while (self._n == len(self._ends) or
+               self._used() + size > len(self._buf)):
+            if self._drop(S_DEBUG):
+                continue
+            if severity == S_DEBUG:
+                self.dropped += 1
+                return
+            self._drop()
+
+        buf = self._buf
+        i = self._used()
+        for part in parts:
+            buf[i:i + len(part)] = part
+            i += len(part)
+        buf[i:i + len(msg)] = msg
+        i += len(msg)
+        buf[i] = 10
+        self._ends[self._n] = i + 1
+        self._severities[self._n] = severity
+        self._n += 1
+
+    def flush(self):
+        """ Sends the queued messages. Messages that cannot be sent are
+            dropped.
+        """
+        buf = memoryview(self._buf)
+        try:
+            if self.dropped:
+                msg = '%d log messages dropped' % self.dropped
+                self._sock.sendto(self.formatter.format(S_WARN, msg),
+                                  self._addr)
+                self.dropped = 0
+            if self._coalesce:
+                if self._n:
+                    self._sock.sendto(buf[:self._used()], self._addr)
+            else:
+                start = 0
+                for j in range(self._n):
+                    end = self._ends[j]
+                    self._sock.sendto(buf[start:end - 1], self._addr)
+                    start = end
+        except OSError:
+            pass
+        self._n = 0
+
+    def close(self):
+        self.flush()
+        super().close()